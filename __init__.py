@@ -14,6 +14,9 @@ from .quantities import __all__ as quantities_all
 from .equations import *
 from .equations import __all__ as equations_all
 
+from .aldi import *
+from .aldi import __all__ as aldi_all
+
 
 __all__ = (
     []
@@ -21,5 +24,6 @@ __all__ = (
     + models_all 
     + quantities_all
     + equations_all
+    + aldi_all
 )
 
@@ -2,3 +2,7 @@
 Algorithmic differentiators and invariators
 """
 
+from .analytic_differentiators import *
+from .analytic_differentiators import __all__ as analytic_differentiators_all
+
+__all__ = analytic_differentiators_all
@@ -0,0 +1,119 @@
+"""
+Calculate first derivatives of a custom function using registered analytic
+partial derivatives
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Callable, Literal, )
+
+from ..aldi import (differentiators as ad_, finite_differentiators as af_, )
+#]
+
+
+__all__ = [
+    "register_partials",
+]
+
+
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+# Exposure
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+
+
+def register_partials(
+    func: Callable,
+    /,
+    *partials: Callable | None,
+) -> Callable:
+    """
+    Register the analytic partial derivatives of a custom function
+    --------------------------------------------------------------
+    * func -- custom function passed in the context of Model.from_string
+    * partials -- one callable per argument of func, taking the same
+    arguments as func and returning the partial derivative w.r.t. that
+    argument; None for arguments w.r.t. which func is never differentiated
+
+    Return func itself so that the registration can be used inline when
+    building the context
+    """
+    _REGISTERED_PARTIALS[func] = tuple(partials)
+    return func
+
+
+def get_partials(func: Callable, /, ) -> tuple[Callable | None, ...] | None:
+    """
+    Return the partial derivatives registered for a custom function, or
+    None if there are none
+    """
+    try:
+        return _REGISTERED_PARTIALS.get(func, )
+    except TypeError:
+        return None
+
+
+def create_differentiator(
+    func: Callable,
+    /,
+    finite_diff: Literal["central", "vectorized", "complex"] = "central",
+) -> Callable:
+    """
+    Decorate a custom function for analytic differentiation if it has
+    registered partials, or for finite differentiation otherwise
+    """
+    partials = get_partials(func, )
+    if partials is None:
+        return af_.finite_differentiator(func, mode=finite_diff, )
+    return analytic_differentiator(func, partials, )
+
+
+def analytic_differentiator(
+    func: Callable,
+    partials: tuple[Callable | None, ...],
+    /,
+) -> Callable:
+    """
+    Decorate a custom function for differentiation by the chain rule using
+    its analytic partial derivatives; each partial is called only for the
+    arguments that depend on the wrt quantities
+    """
+    def wrapper(*args):
+        return _calculate_analytic_derivatives(func, partials, *args, )
+    return wrapper
+
+
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+# Implementation
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+
+
+"""
+Analytic partial derivatives keyed by the custom function; a plain
+dictionary so that bound methods and ufuncs can be registered as well
+"""
+_REGISTERED_PARTIALS = {}
+
+
+def _calculate_analytic_derivatives(
+    func: Callable,
+    partials: tuple[Callable | None, ...],
+    /,
+    *args,
+) -> ad_.Atom:
+    """
+    Total differentiation of a custom function
+    """
+    arg_values = af_.collect_arg_values(*args, )
+    arg_diffs = af_.collect_arg_diffs(*args, )
+    new_value = func(*arg_values, )
+    new_diff = 0
+    for k, d in enumerate(arg_diffs):
+        if not af_.has_diff(d, ):
+            continue
+        partial = partials[k] if k < len(partials) else None
+        if partial is None:
+            raise TypeError(f"No partial derivative registered for argument {k} of custom function {func}")
+        new_diff = new_diff + partial(*arg_values, ) * d
+    return ad_.Atom.no_context(new_value, new_diff, False, )
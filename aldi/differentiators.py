@@ -6,23 +6,39 @@ Algorithmic differentiator
 #[
 from __future__ import annotations
 
-from typing import (Self, NoReturn, Callable, Protocol, )
+from typing import (Self, NoReturn, Callable, Protocol, Any, )
 from numbers import (Number, )
 from collections.abc import (Iterable, Sequence, )
+import threading as th_
 import numpy as np_
 
 from ..exceptions import ListException
 
-from ..aldi import (finite_differentiators as af_, adaptations as aa_, )
-from .. import (equations as eq_, incidence as in_, )
+from ..aldi import (adaptations as aa_, tapes as at_, )
+from ..aldi import (hessians as ah_, maps as am_, analytic_differentiators as an_, )
+from .. import (equations as eq_, incidence as in_, compilers as cm_, )
 #]
 
 
+class _EvalContext(th_.local):
+    """
+    Data and logly contexts of the evaluation running in the current
+    thread; atoms created in context read their values and log status from
+    here, so that each thread differentiates independently
+    """
+    data_context: np_.ndarray | None = None
+    logly_context: dict[int, bool] | None = None
+    direction: np_.ndarray | None = None
+
+
+_EVAL_CONTEXT = _EvalContext()
+
+
 class ValueMixin:
     #[
     @property
     def value(self):
-        return self._value if self._value is not None else type(self)._data_context[self._data_index]
+        return self._value if self._value is not None else _EVAL_CONTEXT.data_context[self._data_index]
     #]
 
 
@@ -30,7 +46,7 @@ class LoglyMixin:
     #[
     @property
     def logly(self):
-        return self._logly if self._logly is not None else type(self)._logly_context.get(self._logly_index, False)
+        return self._logly if self._logly is not None else _EVAL_CONTEXT.logly_context.get(self._logly_index, False)
     #]
 
 
@@ -38,8 +54,6 @@ class Atom(ValueMixin, LoglyMixin):
     """
     Atomic value for differentiation
     """
-    _data_context: np_.ndarray | None = None
-    _logly_context: dict[int, bool] | None = None
     _is_atom: bool = True
     #[
     def __init__(self) -> NoReturn:
@@ -173,15 +187,23 @@ class Atom(ValueMixin, LoglyMixin):
             new_value, new_diff = self._power(other)
         return type(self).no_context(new_value, new_diff, False)
 
+    def __rpow__(self, other):
+        """
+        Differenatiate other**self
+        """
+        new_value, new_diff = self._exponential(other)
+        return type(self).no_context(new_value, new_diff, False)
+
     def _exponential(self, other_value):
         """
         Differenatiate exponential function other_value**self(x)
         """
         new_value = other_value**self.value
-        new_diff = (
-            other_value**self.value * np_.log(other_value) * self.diff 
-            if other_value != 0 else 0
-        )
+        # Zero base has zero derivative; mask it elementwise so that stacked
+        # variants with array values are handled as well
+        is_nonzero = np_.not_equal(other_value, 0)
+        log_other_value = np_.log(np_.where(is_nonzero, other_value, 1))
+        new_diff = np_.where(is_nonzero, new_value, 0) * log_other_value * self.diff
         return new_value, new_diff
 
     def _power(self, other_value):
@@ -225,7 +247,7 @@ class Atom(ValueMixin, LoglyMixin):
         Differentiate sqrt(self)
         """
         new_value = np_.sqrt(self.value)
-        new_diff = 0.5 / np_.sqrt(self.diff)
+        new_diff = 0.5 / new_value * self.diff
         return type(self).no_context(new_value, new_diff, False)
 
     def _maximum_(
@@ -246,7 +268,6 @@ class Atom(ValueMixin, LoglyMixin):
         inx_below = orig_value < floor
         inx_above = orig_value > floor
         new_value[inx_below] = floor
-        new_diff = np_.copy(orig_diff)
         multiplier = np_.copy(orig_value)
         multiplier[inx_floor] = 0.5
         multiplier[inx_above] = 1
@@ -254,7 +275,7 @@ class Atom(ValueMixin, LoglyMixin):
         new_diff = orig_diff * multiplier
         return type(self).no_context(new_value, new_diff, False)
 
-    def _mininum_(
+    def _minimum_(
         self,
         ceiling: Number = 0,
         /,
@@ -262,7 +283,7 @@ class Atom(ValueMixin, LoglyMixin):
         """
         Differenatiate minimum(self, ceiling)
         """
-        return (-self)._max_(-ceiling)
+        return -((-self)._maximum_(-ceiling))
     #]
 
 
@@ -279,8 +300,16 @@ class Context:
         Initialize Audi contextual space
         """
         self._x = None
-        self._func_string = None
+        self._compiled = None
         self._func = None
+        self._tapes = None
+        self._untaped_func = None
+        self._untaped_indexes = ()
+        self._namespace = None
+        self._custom_function_names = ()
+        self._eid_to_rhs_offset = None
+        self._directional_x = None
+        self._directional_func = None
 
 
     @classmethod
@@ -292,8 +321,22 @@ class Context:
         num_columns_to_eval: int,
         custom_functions: dict | None,
         /,
+        tape: bool = False,
+        finite_diff: str = "central",
+        compile_workers: int | None = None,
+        separate_eids: Iterable[int] = (),
     ) -> Self:
         """
+        Compile equations for the Atom path; with tape=True, also compile
+        one Tape per equation, and a separate Atom lambda for only the
+        equations that cannot be taped (e.g. calling custom functions);
+        custom functions with partials registered by
+        analytic_differentiators.register_partials are differentiated
+        analytically, the others numerically; finite_diff selects the mode,
+        see finite_differentiators.finite_differentiator; the equations are
+        compiled in cached chunks, in compile_workers processes if more than
+        one, and the equations with separate_eids in chunks of their own, see
+        compilers.ChunkedEvaluator
         """
         self = cls()
         #
@@ -316,8 +359,9 @@ class Context:
             self._columns_to_eval,
         )
         #
+        self._custom_function_names = tuple(custom_functions or (), )
         custom_functions = { 
-            k: af_.finite_differentiator(v) 
+            k: an_.create_differentiator(v, finite_diff=finite_diff, )
             for k, v in custom_functions.items()
         } if custom_functions else None
         custom_functions = aa_.add_function_adaptations_to_custom_functions(custom_functions)
@@ -327,13 +371,32 @@ class Context:
             len(eid_to_wrt_something[eid]), num_columns_to_eval,
         )
         xtrings = [
-            _create_aldi_xtring(eqn, get_diff_shape_for_eid(eqn.id),)
+            _create_aldi_xtring(eqn, get_diff_shape_for_eid(eqn.id), )
             for eqn in equations
         ]
         #
-        self._func_string = eq_.create_evaluator_func_string(xtrings)
+        separate_eids = set(separate_eids, )
+        self._compiled = cm_.ChunkedEvaluator.from_xtrings(
+            xtrings, workers=compile_workers,
+            separate=(i for i, eqn in enumerate(equations) if eqn.id in separate_eids),
+        )
         #
-        self._func = eval(self._func_string, custom_functions, )
+        self._func = self._compiled.bind(custom_functions, )
+        self._namespace = custom_functions
+        self._eid_to_rhs_offset = am_.create_eid_to_rhs_offset(
+            [ eqn.id for eqn in equations ], eid_to_wrt_something,
+        )
+        #
+        if tape:
+            self._tapes = [
+                _create_tape(eqn, self._x, get_diff_shape_for_eid(eqn.id), )
+                for eqn in equations
+            ]
+            self._untaped_indexes = tuple(i for i, t in enumerate(self._tapes) if t is None)
+            if self._untaped_indexes:
+                self._untaped_func = cm_.ChunkedEvaluator.from_xtrings(
+                    [ xtrings[i] for i in self._untaped_indexes ], workers=compile_workers,
+                ).bind(custom_functions, )
         #
         return self
 
@@ -363,6 +426,7 @@ class Context:
                 # Call the atom factory to create the atom attributes
                 diff = atom_factory.create_diff_from_token(tok, eid_to_wrts[eqn.id], )
                 data_index = atom_factory.create_data_index_from_token(tok, columns_to_eval)
+                data_index = _create_broadcastable_data_index(data_index, )
                 logly_index = atom_factory.create_logly_index_from_token(tok)
                 #
                 # Store the atom in the x dictionary
@@ -376,15 +440,13 @@ class Context:
         steady_array: np_.ndarray,
     ) -> Iterable[Atom]:
         """
-        Evaluate and return a list of final atoms, one for each equation
+        Evaluate and return a list of final atoms, one for each equation;
+        the data context is either a 2-D array (quantities × columns), or
+        a 3-D stack (variants × quantities × columns) in which case values
+        and diffs get a leading variant axis
         """
         self._verify_data_array_shape(data_context.shape)
-        Atom._data_context = data_context
-        Atom._logly_context = logly_context
-        output = self._func(self._x, None, steady_array, )
-        Atom._data_context = None
-        Atom._logly_context = None
-        return output
+        return self._eval_atoms(self._func, data_context, logly_context, steady_array, )
 
     def eval_to_arrays(
         self,
@@ -393,10 +455,10 @@ class Context:
         """
         Evaluate and return arrays of diffs and values extracted from final atoms
         """
-        output = self.eval(*args)
+        output = self.eval(*args) if self._tapes is None else self._replay_tapes(*args)
         return (
-            np_.vstack([x.diff for x in output]),
-            np_.vstack([x.value for x in output]),
+            _stack_rows([x.diff for x in output]),
+            _stack_rows([x.value for x in output]),
         )
 
     def eval_diff_to_array(
@@ -406,20 +468,150 @@ class Context:
         """
         Evaluate and return array of diffs
         """
-        return np_.vstack([
-            x.diff for x in self.eval(*args)
+        output = self.eval(*args) if self._tapes is None else self._replay_tapes(*args)
+        return _stack_rows([
+            x.diff for x in output
             if hasattr(x, "diff")
         ])
 
+    def eval_diff_dot_to_array(
+        self,
+        data_context: np_.ndarray,
+        logly_context: dict[int, bool],
+        steady_array: np_.ndarray,
+        direction: np_.ndarray,
+        /,
+    ) -> np_.ndarray:
+        """
+        Evaluate the derivatives of the diffs along a direction, i.e. the
+        Hessian of each equation times the direction, stacked in the layout
+        of eval_diff_to_array; the direction holds one entry per row of that
+        layout (the component for the wrt quantity of the row); the
+        directional atoms are created and compiled on first use
+        """
+        if self._directional_func is None:
+            self._directional_x = ah_.create_directional_atoms(self._x, self._eid_to_rhs_offset, )
+            namespace = create_namespace_for_atoms(
+                self._namespace, ah_.DirectionalAtom, self._custom_function_names, ah_.create_unsupported,
+            )
+            self._directional_func = self._compiled.bind(namespace, )
+        self._verify_data_array_shape(data_context.shape)
+        previous = _EVAL_CONTEXT.data_context, _EVAL_CONTEXT.logly_context, _EVAL_CONTEXT.direction
+        _EVAL_CONTEXT.data_context = data_context
+        _EVAL_CONTEXT.logly_context = logly_context
+        _EVAL_CONTEXT.direction = np_.asarray(direction, dtype=float, ).reshape(-1)
+        try:
+            output = self._directional_func(self._directional_x, None, steady_array, )
+        finally:
+            _EVAL_CONTEXT.data_context, _EVAL_CONTEXT.logly_context, _EVAL_CONTEXT.direction = previous
+        return _stack_rows([
+            x.diff_dot * np_.ones_like(x.diff, )
+            for x in output
+        ])
+
+    def _replay_tapes(
+        self,
+        data_context: np_.ndarray,
+        logly_context: dict[int, bool],
+        steady_array: np_.ndarray,
+    ) -> Iterable[Atom]:
+        """
+        Replay the tapes and return a list of final atoms, one for each
+        equation; equations without a tape are evaluated by the Atom path
+        """
+        self._verify_data_array_shape(data_context.shape)
+        output = [
+            Atom.no_context(*reversed(t.replay(data_context, logly_context, steady_array, )), False, )
+            if t is not None else None
+            for t in self._tapes
+        ]
+        if self._untaped_func is not None:
+            untaped = self._eval_atoms(self._untaped_func, data_context, logly_context, steady_array, )
+            for i, atom in zip(self._untaped_indexes, untaped, ):
+                output[i] = atom
+        return output
+
+    def _eval_atoms(
+        self,
+        func: Callable,
+        data_context: np_.ndarray,
+        logly_context: dict[int, bool],
+        steady_array: np_.ndarray,
+        /,
+    ) -> list[Atom]:
+        """
+        Run a compiled Atom lambda in the data and logly contexts
+        """
+        # Restore the previous contexts on exit so that evaluations can be
+        # nested, e.g. from within custom functions
+        previous = _EVAL_CONTEXT.data_context, _EVAL_CONTEXT.logly_context
+        _EVAL_CONTEXT.data_context = data_context
+        _EVAL_CONTEXT.logly_context = logly_context
+        try:
+            return func(self._x, None, steady_array, )
+        finally:
+            _EVAL_CONTEXT.data_context, _EVAL_CONTEXT.logly_context = previous
+
     def _verify_data_array_shape(self, shape_data: np_.ndarray) -> NoReturn:
         """
         """
-        if shape_data[0]>=self.shape_data[0] and shape_data[1]>=self.shape_data[1]:
+        if shape_data[-2]>=self.shape_data[0] and shape_data[-1]>=self.shape_data[1]:
             return
         raise InvalidInputDataArrayShape(shape_data, self.shape_data)
     #]
 
 
+def create_namespace_for_atoms(
+    namespace: dict[str, Any],
+    atom_class: type,
+    custom_names: Iterable[str],
+    create_stand_in: Callable[[str], Callable],
+    /,
+) -> dict[str, Any]:
+    """
+    Create the namespace in which the aldi lambda of a Context is evaluated
+    with another atom class; the custom functions are replaced with the
+    stand-ins created from their names
+    """
+    #[
+    namespace = dict(namespace)
+    namespace["Atom"] = atom_class
+    for n in custom_names:
+        namespace[n] = create_stand_in(n, )
+    return namespace
+    #]
+
+
+def lift_to_atom(other: Any, atom_class: type, /, ) -> Any:
+    """
+    Return an atom as is, or wrap a constant as an atom of atom_class with
+    zero derivatives
+    """
+    return other if hasattr(other, "_is_atom", ) else atom_class.from_constant(other, )
+
+
+def _stack_rows(arrays: Iterable[np_.ndarray], /, ) -> np_.ndarray:
+    """
+    Stack arrays along their rows (second-to-last axis) into one array,
+    broadcasting any leading axes
+    """
+    #[
+    arrays = [
+        a.reshape(1, -1) if isinstance(a, np_.ndarray) and a.ndim == 1 else a
+        for a in arrays
+    ]
+    num_rows = sum(a.shape[-2] for a in arrays)
+    num_columns = max((a.shape[-1] for a in arrays), default=1, )
+    lead_shape = np_.broadcast_shapes(*(a.shape[:-2] for a in arrays), )
+    stacked = np_.zeros(lead_shape + (num_rows, num_columns, ), dtype=float, )
+    offset = 0
+    for a in arrays:
+        stacked[..., offset:offset+a.shape[-2], :] = a
+        offset += a.shape[-2]
+    return stacked
+    #]
+
+
 def _create_aldi_xtring(
     equation: eq_.Equation,
     diff_shape: tuple[int, int],
@@ -428,13 +620,57 @@ def _create_aldi_xtring(
     """
     """
     #[
-    xtring = equation.replace_equation_ref_in_xtring(equation.id)
-    xtring = xtring.replace("[", "['").replace("]", "']")
+    xtring = _create_keyed_xtring(equation, )
     sign = "+" if not xtring.startswith("-") and not xtring.startswith("+") else ""
     return f"Atom.zero_atom({diff_shape})" + sign + xtring
     #]
 
 
+def _create_keyed_xtring(
+    equation: eq_.Equation,
+    /,
+) -> str:
+    """
+    Create an xtring with quoted keys into the dictionary of atoms
+    """
+    #[
+    xtring = equation.replace_equation_ref_in_xtring(equation.id)
+    return xtring.replace("[", "['").replace("]", "']")
+    #]
+
+
+def _create_tape(
+    equation: eq_.Equation,
+    atoms: dict[str, Atom],
+    diff_shape: tuple[int, int],
+    /,
+) -> at_.Tape | None:
+    """
+    Compile a Tape for an equation, or return None if the equation needs
+    the Atom path, e.g. because it calls custom functions
+    """
+    #[
+    try:
+        return at_.Tape.from_xtring(_create_keyed_xtring(equation, ), atoms, diff_shape, )
+    except at_.UntapeableExpression:
+        return None
+    #]
+
+
+def _create_broadcastable_data_index(
+    data_index: tuple[int, slice],
+    /,
+) -> tuple:
+    """
+    Turn a (row, columns) data index into one that keeps the row axis and
+    any leading variant axes, so that values broadcast against diffs
+    """
+    #[
+    row, columns = data_index
+    return (Ellipsis, row, None, columns, )
+    #]
+
+
 def _create_aldi_key(
     token: in_.Token,
     eid: int,
@@ -476,7 +712,8 @@ class AtomFactoryProtocol(Protocol, ):
     def create_diff_from_token(
         token: in_.Token,
         wrt_qids: in_.Tokens,
-    ) -> np_.ndarray:
+        /,
+    ) -> np_.ndarray | Number:
         """
         Create a diff for an atom from a token
         """
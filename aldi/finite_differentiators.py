@@ -6,9 +6,9 @@ Calculate first derivatives of a custom function using finite approximation
 #[
 from __future__ import annotations
 
-from typing import (NoReturn, Callable, )
+from typing import (NoReturn, Callable, Literal, )
+from numbers import (Number, )
 import numpy as np_
-import copy as co_
 
 from ..aldi import (differentiators as ad_, )
 #]
@@ -19,21 +19,61 @@ from ..aldi import (differentiators as ad_, )
 #••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
 
 
-def finite_differentiator(func: Callable) -> Callable:
+def finite_differentiator(
+    func: Callable,
+    /,
+    mode: Literal["central", "vectorized", "complex"] = "central",
+) -> Callable:
     """
     Decorate a custom function for finite differentiation
-    """
+    ------------------------------------------------------
+    * mode="central" -- two-sided differences, two calls per argument
+    * mode="vectorized" -- two-sided differences, all perturbations stacked
+    along a new leading axis and evaluated in one call; the function must
+    broadcast elementwise over NumPy arrays
+    * mode="complex" -- complex-step derivatives, one call per argument; the
+    function must be analytic and accept complex arguments
+    """
+    calculate = _FINITE_DERIVATIVE_CALCULATORS[mode]
     def wrapper(*args):
-        return _calculate_finite_derivatives(func, *args)
+        return calculate(func, *args)
     return wrapper
 
 
+def collect_arg_values(*args, ):
+    """
+    Collect the values of input arguments, both Atom values and primitives
+    """
+    return [
+        a.value if hasattr(a, "_is_atom", ) else a
+        for a in args
+    ]
+
+
+def collect_arg_diffs(*args, ):
+    """
+    Collect the diffs of input arguments for Atoms or Nones for primitives
+    """
+    return [
+        a.diff if hasattr(a, "_is_atom", ) else None
+        for a in args
+    ]
+
+
+def has_diff(diff, ):
+    """
+    True for diffs of Atoms that depend on the wrt quantities
+    """
+    return diff is not None and not (isinstance(diff, Number) and diff == 0)
+
+
 #••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
 # Implementation
 #••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
 
 
 _RELATIVE_FINITE_DIFF_STEP = 1e-6
+_COMPLEX_STEP = 1e-20
 
 
 def _calculate_finite_derivatives(
@@ -44,9 +84,9 @@ def _calculate_finite_derivatives(
     """
     Total finite differentiation of a custom function
     """
-    arg_values = _collect_arg_values(*args, )
+    arg_values = collect_arg_values(*args, )
     new_value = func(*arg_values, )
-    arg_diffs = _collect_arg_diffs(*args, )
+    arg_diffs = collect_arg_diffs(*args, )
     new_diff = sum(
         _partial_times_inner(func, k, arg_values, arg_diffs, )
         for k in range(len(args, ), )
@@ -54,6 +94,70 @@ def _calculate_finite_derivatives(
     return ad_.Atom.no_context(new_value, new_diff, False, )
 
 
+def _calculate_vectorized_finite_derivatives(
+    func: Callable,
+    /,
+    *args,
+) -> Callable:
+    """
+    Total finite differentiation of a custom function with the unperturbed
+    and all two-sided perturbed arguments evaluated in one broadcast call
+    """
+    arg_values = collect_arg_values(*args, )
+    arg_diffs = collect_arg_diffs(*args, )
+    wrt = [ k for k, d in enumerate(arg_diffs) if has_diff(d, ) ]
+    if not wrt:
+        return ad_.Atom.no_context(func(*arg_values, ), 0, False, )
+    #
+    # Row 0 is unperturbed; rows 2*i+1 and 2*i+2 perturb the wrt[i]-th
+    # argument up and down; the other arguments broadcast as they are
+    num_rows = 1 + 2*len(wrt)
+    epsilons = { k: _get_epsilon(arg_values[k], ) for k in wrt }
+    stacked_values = list(arg_values)
+    for i, k in enumerate(wrt):
+        stacked_values[k] = _stack_perturbations(arg_values[k], num_rows, i, epsilons[k], )
+    stacked_output = np_.asarray(func(*stacked_values, ), )
+    new_value = stacked_output[0]
+    new_diff = sum(
+        (stacked_output[2*i+1] - stacked_output[2*i+2]) / (2 * epsilons[k]) * arg_diffs[k]
+        for i, k in enumerate(wrt)
+    )
+    return ad_.Atom.no_context(new_value, new_diff, False, )
+
+
+def _calculate_complex_step_derivatives(
+    func: Callable,
+    /,
+    *args,
+) -> Callable:
+    """
+    Total complex-step differentiation of a custom function; the value is
+    the real part of any of the perturbed calls
+    """
+    arg_values = collect_arg_values(*args, )
+    arg_diffs = collect_arg_diffs(*args, )
+    new_value = None
+    new_diff = 0
+    for k, d in enumerate(arg_diffs):
+        if not has_diff(d, ):
+            continue
+        arg_values_plus = list(arg_values)
+        arg_values_plus[k] = arg_values[k] + 1j * _COMPLEX_STEP
+        output = func(*arg_values_plus, )
+        new_value = np_.real(output) if new_value is None else new_value
+        new_diff = new_diff + np_.imag(output) / _COMPLEX_STEP * d
+    if new_value is None:
+        new_value = func(*arg_values, )
+    return ad_.Atom.no_context(new_value, new_diff, False, )
+
+
+_FINITE_DERIVATIVE_CALCULATORS = {
+    "central": _calculate_finite_derivatives,
+    "vectorized": _calculate_vectorized_finite_derivatives,
+    "complex": _calculate_complex_step_derivatives,
+}
+
+
 def _partial_times_inner(func, k, arg_values, arg_diffs, ):
     """
     For f(..., g(x), ...), evaluate diff of f wrt the k-th argument times dg/dx
@@ -76,38 +180,29 @@ def _partial_two_sided_derivative(func, k, arg_values, ):
 
 def _plus_epsilon(arg_values, k, epsilon, ):
     """
-    Create a copy of function arguments and increase k-th argument by epsilon
+    Create a shallow copy of function arguments with the k-th argument
+    replaced by a new object increased by epsilon; the other arguments are
+    never modified, so they need not be copied
     """
-    arg_values_plus = co_.deepcopy(arg_values)
-    arg_values_plus[k] += epsilon
+    arg_values_plus = list(arg_values)
+    arg_values_plus[k] = arg_values[k] + epsilon
     return arg_values_plus
 
 
-def _get_epsilon(value, ):
+def _stack_perturbations(value, num_rows, index, epsilon, ):
     """
-    Calculate the differentiation step based on the value around which we differentiate
+    Broadcast an argument value along a new leading axis of num_rows rows,
+    perturbing rows 2*index+1 and 2*index+2 by +epsilon and -epsilon
     """
-    base = np_.maximum(abs(value), 1)
-    return base * _RELATIVE_FINITE_DIFF_STEP
+    stacked = np_.repeat(np_.asarray(value, dtype=float, )[np_.newaxis, ...], num_rows, axis=0, )
+    stacked[2*index+1] += epsilon
+    stacked[2*index+2] -= epsilon
+    return stacked
 
 
-def _collect_arg_values(*args, ):
-    """
-    Collect the values of input arguments, both Atom values and primitives
-    """
-    return [
-        co_.deepcopy(a.value) if hasattr(a, "_is_atom", ) else a
-        for a in args
-    ]
-
-
-def _collect_arg_diffs(*args, ):
+def _get_epsilon(value, ):
     """
-    Collect the diffs of input arguments for Atoms or Nones for primitives
+    Calculate the differentiation step based on the value around which we differentiate
     """
-    return [
-        co_.deepcopy(a.diff) if hasattr(a, "_is_atom", ) else None
-        for a in args
-    ]
-
-
+    base = np_.maximum(abs(value), 1)
+    return base * _RELATIVE_FINITE_DIFF_STEP
@@ -0,0 +1,273 @@
+"""
+Second-order extension of the algorithmic differentiator
+
+A DirectionalAtom carries, besides the value and the diff (first
+derivatives), their derivatives along a direction in the space of the wrt
+quantities: the value dot (the directional derivative) and the diff dot
+(the Hessian of the atom times the direction). Evaluating the equations
+with directional atoms gives exact Hessian-vector products.
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Self, NoReturn, Callable, Any, )
+from collections.abc import (Iterable, )
+from numbers import (Number, )
+import numpy as np_
+
+from ..aldi import (differentiators as ad_, )
+#]
+
+
+class UnsupportedSecondOrder(Exception):
+    """
+    Raised when an equation calls a function without a second-order rule,
+    e.g. a custom function
+    """
+    pass
+
+
+class DirectionalAtom:
+    """
+    Atomic value for second-order differentiation along a direction
+    """
+    _is_atom: bool = True
+    #[
+    def __init__(self, /, ) -> NoReturn:
+        """
+        """
+        self._value = None
+        self._diff = None
+        self._value_dot = None
+        self._diff_dot = None
+        self._logly = None
+        self._data_index = None
+        self._logly_index = None
+        self._direction_index = None
+
+    @classmethod
+    def no_context(
+        cls,
+        value: Number,
+        diff: np_.ndarray | Number,
+        value_dot: Number,
+        diff_dot: np_.ndarray | Number,
+        /,
+    ) -> Self:
+        """
+        Create atom with self-contained values and diffs
+        """
+        self = cls()
+        self._value = value
+        self._diff = diff
+        self._value_dot = value_dot
+        self._diff_dot = diff_dot
+        self._logly = False
+        return self
+
+    @classmethod
+    def from_constant(cls, value: Number, /, ) -> Self:
+        """
+        Create atom of a constant with zero derivatives
+        """
+        return cls.no_context(value, 0, 0, 0, )
+
+    @classmethod
+    def in_context(
+        cls,
+        diff: np_.ndarray | Number,
+        data_index: tuple[int, slice],
+        logly_index: int,
+        direction_index: int | None,
+        /,
+    ) -> Self:
+        """
+        Create atom with pointers to the data, logly and direction contexts;
+        direction_index is the row of the stacked diff array at which the
+        direction component of this atom's wrt quantity is found, or None
+        """
+        self = cls()
+        self._diff = diff
+        self._data_index = data_index
+        self._logly_index = logly_index
+        self._direction_index = direction_index
+        return self
+
+    @classmethod
+    def zero_atom(
+        cls,
+        diff_shape: tuple[int, int],
+    ) -> Self:
+        zero_diff = np_.zeros(diff_shape, )
+        return cls.no_context(0, zero_diff, 0, zero_diff, )
+
+    @property
+    def value(self, /, ):
+        return self._value if self._value is not None else ad_._EVAL_CONTEXT.data_context[self._data_index]
+
+    @property
+    def logly(self, /, ):
+        return self._logly if self._logly is not None else ad_._EVAL_CONTEXT.logly_context.get(self._logly_index, False)
+
+    @property
+    def diff(self, /, ):
+        return self._diff if not self.logly else self._diff * self.value
+
+    @property
+    def value_dot(self, /, ):
+        """
+        Directional derivative of the value; for a log variable x, the wrt
+        quantity is log(x), and the directional derivative is x times the
+        direction
+        """
+        if self._value_dot is not None:
+            return self._value_dot
+        if self._direction_index is None:
+            return 0
+        direction = ad_._EVAL_CONTEXT.direction[self._direction_index]
+        return direction if not self.logly else direction * self.value
+
+    @property
+    def diff_dot(self, /, ):
+        """
+        Directional derivative of the diff; nonzero only for log variables,
+        whose diff x*e scales with the value
+        """
+        if self._diff_dot is not None:
+            return self._diff_dot
+        return self._diff * self.value_dot if self.logly else 0
+
+    def _chain(self, g0, g1, g2, /, ) -> Self:
+        """
+        Apply a scalar function with value g0, first derivative g1 and second
+        derivative g2 evaluated at the value of self
+        """
+        value_dot = self.value_dot
+        return type(self).no_context(
+            g0,
+            g1 * self.diff,
+            g1 * value_dot,
+            g2 * value_dot * self.diff + g1 * self.diff_dot,
+        )
+
+    def __pos__(self, /, ) -> Self:
+        return self
+
+    def __neg__(self, /, ) -> Self:
+        return type(self).no_context(-self.value, -self.diff, -self.value_dot, -self.diff_dot, )
+
+    def __add__(self, other, /, ) -> Self:
+        other = ad_.lift_to_atom(other, DirectionalAtom, )
+        return type(self).no_context(
+            self.value + other.value,
+            self.diff + other.diff,
+            self.value_dot + other.value_dot,
+            self.diff_dot + other.diff_dot,
+        )
+
+    def __sub__(self, other, /, ) -> Self:
+        return self.__add__(-ad_.lift_to_atom(other, DirectionalAtom, ), )
+
+    def __rsub__(self, other, /, ) -> Self:
+        return ad_.lift_to_atom(other, DirectionalAtom, ).__add__(-self, )
+
+    def __mul__(self, other, /, ) -> Self:
+        other = ad_.lift_to_atom(other, DirectionalAtom, )
+        a, da, a_dot, da_dot = self.value, self.diff, self.value_dot, self.diff_dot
+        b, db, b_dot, db_dot = other.value, other.diff, other.value_dot, other.diff_dot
+        return type(self).no_context(
+            a * b,
+            da * b + a * db,
+            a_dot * b + a * b_dot,
+            da_dot * b + da * b_dot + a_dot * db + a * db_dot,
+        )
+
+    def __truediv__(self, other, /, ) -> Self:
+        return self.__mul__(ad_.lift_to_atom(other, DirectionalAtom, )._reciprocal(), )
+
+    def __rtruediv__(self, other, /, ) -> Self:
+        return ad_.lift_to_atom(other, DirectionalAtom, ).__mul__(self._reciprocal(), )
+
+    def __pow__(self, other, /, ) -> Self:
+        if hasattr(other, "_is_atom", ):
+            # self(x)**other(x) = exp(other(x) * log(self(x)))
+            return (other * self._log_())._exp_()
+        value = self.value
+        return self._chain(
+            value ** other,
+            other * value ** (other - 1),
+            other * (other - 1) * value ** (other - 2),
+        )
+
+    def __rpow__(self, other, /, ) -> Self:
+        # other**self(x) = exp(self(x) * log(other))
+        return (self * np_.log(other))._exp_()
+
+    def _reciprocal(self, /, ) -> Self:
+        value = self.value
+        return self._chain(1 / value, -1 / value**2, 2 / value**3, )
+
+    def _log_(self, /, ) -> Self:
+        value = self.value
+        return self._chain(np_.log(value), 1 / value, -1 / value**2, )
+
+    def _exp_(self, /, ) -> Self:
+        new_value = np_.exp(self.value)
+        return self._chain(new_value, new_value, new_value, )
+
+    def _sqrt_(self, /, ) -> Self:
+        new_value = np_.sqrt(self.value)
+        return self._chain(new_value, 0.5 / new_value, -0.25 / (new_value * self.value), )
+
+    def _maximum_(self, floor: Number = 0, /, ) -> Self:
+        """
+        Piecewise linear; the derivatives are halved where self hits the floor
+        """
+        value = self.value
+        multiplier = np_.where(value > floor, 1.0, np_.where(value == floor, 0.5, 0.0), )
+        return self._chain(np_.maximum(value, floor), multiplier, 0, )
+
+    def _minimum_(self, ceiling: Number = 0, /, ) -> Self:
+        return -((-self)._maximum_(-ceiling))
+
+    __radd__ = __add__
+
+    __rmul__ = __mul__
+    #]
+
+
+def create_directional_atoms(
+    atoms: dict[str, ad_.Atom],
+    eid_to_rhs_offset: dict[int, int],
+    /,
+) -> dict[str, DirectionalAtom]:
+    """
+    Create directional atoms mirroring the atoms of a Context; the diff of
+    each atom is expanded to a dense unit vector
+    """
+    #[
+    directional_atoms = {}
+    for key, atom in atoms.items():
+        diff = atom._diff
+        if isinstance(diff, Number):
+            direction_index = None
+        else:
+            eid = int(key.rsplit(",", 1, )[1])
+            direction_index = eid_to_rhs_offset[eid] + int(np_.flatnonzero(diff[:, 0])[0])
+        directional_atoms[key] = DirectionalAtom.in_context(
+            diff, atom._data_index, atom._logly_index, direction_index,
+        )
+    return directional_atoms
+    #]
+
+
+def create_unsupported(name: str, /, ) -> Callable:
+    """
+    Stand in for a custom function, which has no second-order rule
+    """
+    def func(*args, **kwargs, ):
+        raise UnsupportedSecondOrder(f"No second-order rule for function {name}")
+    return func
+
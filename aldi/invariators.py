@@ -1,25 +1,31 @@
 """
+Invariance analysis of derivatives
+
+An invariator Atom carries, instead of values, two boolean columns with
+one entry per wrt quantity: the diff pattern (True where the derivative is
+structurally nonzero) and the invariance pattern (True where the
+derivative does not change with the wrt quantities, i.e. depends on
+parameters and other fixed data only). Evaluating the equations with
+invariator atoms classifies every entry of their Jacobian.
 """
 
 
 #[
 from __future__ import annotations
 
-from typing import (Self, NoReturn, )
+from typing import (Self, NoReturn, Any, Callable, )
+from collections.abc import (Iterable, )
 from numbers import (Number, )
 import numpy as np_
 
 from ..aldi import (differentiators as ad_, )
-from .. import (incidence as in_, )
 #]
 
 
-class Atom(ad_.LoglyMixin):
+class Atom:
     """
     Atomic value for invariance testing
     """
-    _data_context: np_.ndarray | None = None
-    _logly_context: dict[int, bool] | None = None
     _is_atom: bool = True
     #[
     def __init__(self) -> NoReturn:
@@ -27,135 +33,188 @@ class Atom(ad_.LoglyMixin):
         """
         self._diff = None
         self._invariant = None
-        self._logly = None
-        self._logly_index = None
 
     @classmethod
     def no_context(
         cls: type,
-        diff: np_.ndarray,
-        invariant: np_.ndarray,
-        logly: bool,
+        diff: np_.ndarray | bool,
+        invariant: np_.ndarray | bool,
     ) -> Self:
         self = cls()
         self._diff = diff
         self._invariant = invariant
         return self
 
+    @classmethod
+    def from_constant(cls: type, value: Number | None, /, ) -> Self:
+        """
+        Create atom of a constant, with no diff
+        """
+        return cls.no_context(np_.bool_(False), np_.bool_(True), )
+
     @classmethod
     def in_context(
         cls: type,
-        diff: np_.ndarray,
-        token: in_.Token,
-        *args,
+        diff: np_.ndarray | Number,
+        logly: bool,
     ) -> Self:
         """
+        Create atom from the diff of a differentiator atom; the derivative
+        of a log variable w.r.t. its log is the variable itself, and hence
+        not invariant
         """
-        self = cls()
-        self._diff = diff==1
-        self._invariant = np_.full((diff.shape[0], 1), True)
-        self._logly_index = token.qid
+        if isinstance(diff, Number):
+            return cls.no_context(np_.bool_(diff != 0), np_.bool_(True), )
+        diff = np_.asarray(diff, )[:, :1] != 0
+        return cls.no_context(diff, ~diff if logly else np_.ones_like(diff, ), )
+
+    @classmethod
+    def zero_atom(
+        cls,
+        diff_shape: tuple[int, int],
+    ) -> Self:
+        return cls.no_context(
+            np_.zeros((diff_shape[0], 1), dtype=bool, ),
+            np_.ones((diff_shape[0], 1), dtype=bool, ),
+        )
+
+    @property
+    def is_constant(self, /, ) -> bool:
+        """
+        True if the value does not depend on any wrt quantity
+        """
+        return not np_.any(self._diff)
+
+    def __pos__(self) -> Self:
+        return self
+
+    def __neg__(self) -> Self:
         return self
 
     def __add__(self, other: Self | Number) -> Self:
         """
         Invariance of self(x)+other(x) or self(x)+other
         """
-        if hasattr(other, "_is_atom"):
-            new_diff = self._diff | other._diff
-            new_invariant = self._invariant & other._invariant
-        else:
-            new_diff = self._diff
-            new_invariant = self._invariant
-        return Atom.no_context(new_diff, new_invariant, False)
-
-    def __mul__(self, other: Self | Number):
-        """
-        Invariance of self(x)*other(x) or self(x)*other
-        """
-        if hasattr(other, "_is_atom"):
-            new_diff = self._diff | other._diff
-            if np_.all(self._diff==False):
-                new_invariant = other._invariant
-                new_logly = other.logly
-            elif np_.all(other._diff==False):
-                new_invariant = self._invariant
-                new_logly = self.logly
-            else:
-                new_invariant = (
-                    np_.logical_not(self._diff) & other._invariant
-                    & np_.logical_not(other._diff) & self._invariant
-                )
-                new_logly = False
-        else:
-            new_diff = self._diff
-            new_invariant = self._invariant
-            new_logly = self.logly
-        return Atom.no_context(new_diff, new_invariant, new_logly)
-
-    def __rmul__(self, other):
-        """
-        Invariance of other*self(x)
-        """
-        return Atom.no_context(self._diff, self._invariant, self._logly)
-
-    def __truediv__(self, other):
+        other = ad_.lift_to_atom(other, Atom, )
+        return Atom.no_context(
+            self._diff | other._diff,
+            self._invariant & other._invariant,
+        )
+
+    def __mul__(self, other: Self | Number) -> Self:
+        """
+        Invariance of self(x)*other(x) or self(x)*other; the derivative
+        da*b + a*db is invariant where each nonzero term is the product of an
+        invariant derivative and a constant
+        """
+        other = ad_.lift_to_atom(other, Atom, )
+        return Atom.no_context(
+            self._diff | other._diff,
+            (~self._diff | (self._invariant & other.is_constant))
+            & (~other._diff | (other._invariant & self.is_constant)),
+        )
+
+    def __truediv__(self, other: Self | Number) -> Self:
         """
         Invariance of self(x)/other(x) or self(x)/other
         """
-        if hasattr(other, "_is_atom"):
-            new_diff = self._diff | other._diff
-            new_invariant = np_.all(other._diff, axis=0) & self._invariant
-            new_logly = False
-        else:
-            new_diff = self._diff
-            new_invariant = self._invariant
-            new_logly = self._logly
-        return Atom.no_context(new_diff, new_invariant, new_logly)
+        other = ad_.lift_to_atom(other, Atom, )
+        return Atom.no_context(
+            self._diff | other._diff,
+            (~self._diff | (self._invariant & other.is_constant)) & ~other._diff,
+        )
 
     def __rtruediv__(self, other: Number) -> Self:
         """
-        Invariance of self(x) / other
+        Invariance of other / self(x)
         """
-        new_diff = self._diff
-        new_invariant = False & self._invariant
-        return Atom.no_context(new_diff, new_invariant, False)
+        return self._nonlinear()
 
-    __sub__ = __add__
-
-    __radd__ = __add__
-
-    __rsub__ = __add__
-
-    def _log_(self) -> Self:
+    def __pow__(self, other: Self | Number) -> Self:
         """
-        Invariance of log(self(x))
+        Invariance of self(x)**other(x) or self(x)**other
         """
-        new_diff = self._diff
-        new_invariant = new_invariant if self._logly else (False & self._invariant)
-        return Atom.no_context(new_diff, new_invariant, False)
+        if not hasattr(other, "_is_atom"):
+            if other == 1:
+                return self
+            if other == 0:
+                return Atom.from_constant(1, )
+        return self._nonlinear(other, )
 
-    def _unary(self) -> Self:
+    def __rpow__(self, other: Number) -> Self:
         """
-        Invariance of f(self(x))
+        Invariance of other**self(x)
         """
-        new_diff = self._diff
-        new_invariant = False & self._invariant
-        return Atom.no_context(new_diff, new_invariant, False)
+        return self._nonlinear()
 
-    def _binary(self, other: Self | Number) -> Self:
+    def _nonlinear(self, *others) -> Self:
         """
-        Invariance of f(self(x), other(x)) or f(self(x), other)
+        Invariance of a nonlinear function f(self(x), *others); the
+        derivatives are invariant only where they are zero
         """
-        if hasattr(other, "_is_atom"):
-            new_diff = self._diff | other._diff
-        else:
-            new_diff = self._diff
-        new_invariant = False & self._invariant
-        return Atom.no_context(new_diff, new_invariant, False)
+        new_diff = self._diff
+        for o in others:
+            new_diff = new_diff | ad_.lift_to_atom(o, Atom, )._diff
+        return Atom.no_context(new_diff, ~new_diff, )
+
+    def __sub__(self, other):
+        return self.__add__(other, )
+
+    def __rsub__(self, other):
+        return self.__add__(other, )
+
+    __radd__ = __add__
+
+    __rmul__ = __mul__
+
+    _log_ = _nonlinear
+    _exp_ = _nonlinear
+    _sqrt_ = _nonlinear
+    _maximum_ = _nonlinear
+    _minimum_ = _nonlinear
+    #]
+
 
-    exp = _unary
-    __pow__ = _binary
+def create_invariance_masks(
+    context: ad_.Context,
+    logly_context: dict[int, bool],
+    /,
+) -> list[np_.ndarray] | None:
+    """
+    Evaluate the equations of a differentiator context with invariator
+    atoms and return, for each equation, a boolean column with True for the
+    entries of its diff that are invariant (including structural zeros);
+    return None if the equations contain operations the invariator atoms do
+    not support
+    """
+    #[
+    atoms = {
+        key: Atom.in_context(atom._diff, logly_context.get(atom._logly_index, False), )
+        for key, atom in context._x.items()
+    }
+    namespace = ad_.create_namespace_for_atoms(
+        context._namespace, Atom, context._custom_function_names, _create_opaque,
+    )
+    try:
+        output = context._compiled.bind(namespace, )(atoms, None, None, )
+    except (TypeError, AttributeError, ):
+        return None
+    return [
+        np_.asarray(a._invariant | ~a._diff, dtype=bool, ).reshape(-1)
+        if hasattr(a, "_is_atom") else None
+        for a in output
+    ]
     #]
 
 
+def _create_opaque(name: str, /, ) -> Callable:
+    """
+    Stand in for a custom function without calling it: the result is
+    nonlinear in the atom arguments, or constant if there are none
+    """
+    def opaque(*args, **kwargs, ):
+        atoms = [ a for a in args if hasattr(a, "_is_atom", ) ]
+        if not atoms:
+            return Atom.from_constant(None, )
+        return atoms[0]._nonlinear(*atoms[1:], )
+    return opaque
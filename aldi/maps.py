@@ -11,22 +11,34 @@ from typing import (Self, NoReturn, Any, )
 from collections.abc import (Iterable, )
 import itertools as it_
 import dataclasses as dc_
+import numpy as np_
 #]
 
 
+_INDEX_DTYPE = np_.int32
+
+
 @dc_.dataclass
 class ArrayMap:
     """
+    Pairs of (row, column) index arrays; the entries of the rhs array at
+    rhs are placed in the lhs array at lhs
     """
-    lhs: tuple[list[int], list[int]] | None = None
-    rhs: tuple[list[int], list[int]] | None = None
+    lhs: tuple[np_.ndarray, np_.ndarray] | None = None
+    rhs: tuple[np_.ndarray, np_.ndarray] | None = None
     #[
-    def __init__(self, /, ) -> NoReturn:
-        self.lhs = ([], [])
-        self.rhs = ([], [])
+    def __init__(
+        self,
+        lhs: tuple[Iterable[int], Iterable[int]] = ((), ()),
+        rhs: tuple[Iterable[int], Iterable[int]] = ((), ()),
+        /,
+    ) -> NoReturn:
+        self.lhs = (_index_array(lhs[0]), _index_array(lhs[1]))
+        self.rhs = (_index_array(rhs[0]), _index_array(rhs[1]))
+        self._raveled = {}
 
     def __len__(self, /, ) -> int:
-        return len(self.lhs[0])
+        return self.lhs[0].size
 
     def append(
         self,
@@ -36,10 +48,7 @@ class ArrayMap:
     ) -> NoReturn:
         """
         """
-        self.lhs[0].append(lhs[0])
-        self.lhs[1].append(lhs[1])
-        self.rhs[0].append(rhs[0])
-        self.rhs[1].append(rhs[1])
+        self.merge_with(type(self)(([lhs[0]], [lhs[1]]), ([rhs[0]], [rhs[1]])))
 
     def merge_with(
         self,
@@ -47,81 +56,91 @@ class ArrayMap:
     ) -> NoReturn:
         """
         """
-        self.lhs = (self.lhs[0]+other.lhs[0], self.lhs[1]+other.lhs[1])
-        self.rhs = (self.rhs[0]+other.rhs[0], self.rhs[1]+other.rhs[1])
+        self.lhs = tuple(_concatenate((self.lhs[i], other.lhs[i])) for i in (0, 1))
+        self.rhs = tuple(_concatenate((self.rhs[i], other.rhs[i])) for i in (0, 1))
+        self._raveled = {}
 
     def remove_nones(self) -> NoReturn:
         """
-        Remove any map entry that has a None for the row index on the LHS
+        Remove any map entry that has a negative (missing) row index on the
+        LHS; tokens missing from the lhs columns produce no entries in the
+        first place
         """
-        if not self.lhs[0]:
+        keep = self.lhs[0] >= 0
+        if keep.all():
             return
-        zipped_pruned = [
-            i for i in zip(self.lhs[0], self.lhs[1], self.rhs[0], self.rhs[1])
-            if i[0] is not None
-        ]
-        unzipped_pruned = list(zip(*zipped_pruned))
-        self.lhs = (list(unzipped_pruned[0]), list(unzipped_pruned[1]))
-        self.rhs = (list(unzipped_pruned[2]), list(unzipped_pruned[3]))
+        self.lhs = (self.lhs[0][keep], self.lhs[1][keep])
+        self.rhs = (self.rhs[0][keep], self.rhs[1][keep])
+        self._raveled = {}
 
-    @classmethod
-    def for_equations(
-        cls,
-        eids: list[int],
-        eid_to_wrt_tokens: dict[int, Any],
-        tokens_in_columns_on_rhs: list[Any],
-        eid_to_rhs_offset: dict[int, int],
+    def raveled_lhs(self, shape: tuple[int, int], /, ) -> np_.ndarray:
+        """
+        Flat indices of the lhs entries in a C-ordered array of a given shape
+        """
+        return self._ravel(0, shape, )
+
+    def raveled_rhs(self, shape: tuple[int, int], /, ) -> np_.ndarray:
+        """
+        Flat indices of the rhs entries in a C-ordered array of a given shape
+        """
+        return self._ravel(1, shape, )
+
+    def transfer(
+        self,
+        lhs_array: np_.ndarray,
+        rhs_array: np_.ndarray,
         /,
-        **kwargs,
-    ) -> Self:
+    ) -> NoReturn:
         """
+        Place the rhs entries of rhs_array in lhs_array in place, along any
+        leading axes; lhs_array must be C-contiguous
         """
-        return merge_array_maps(
-            cls._for_single_equation(
-                eid_to_wrt_tokens[eid],
-                tokens_in_columns_on_rhs,
-                eid_to_rhs_offset[eid],
-                lhs_row,
-                **kwargs,
-            )
-            for lhs_row, eid in enumerate(eids)
-        )
+        lhs_index = self.raveled_lhs(lhs_array.shape[-2:], )
+        rhs_index = self.raveled_rhs(rhs_array.shape[-2:], )
+        if lhs_array.ndim == 2 and rhs_array.ndim == 2:
+            np_.put(lhs_array, lhs_index, np_.take(rhs_array, rhs_index, ), )
+            return
+        flat_lhs_array = lhs_array.reshape(lhs_array.shape[:-2] + (-1, ), )
+        flat_rhs_array = rhs_array.reshape(rhs_array.shape[:-2] + (-1, ), )
+        flat_lhs_array[..., lhs_index] = np_.take(flat_rhs_array, rhs_index, axis=-1, )
+
+    def _ravel(self, side: int, shape: tuple[int, int], /, ) -> np_.ndarray:
+        key = (side, ) + tuple(shape)
+        if key not in self._raveled:
+            self._raveled[key] = np_.ravel_multi_index(
+                (self.lhs, self.rhs)[side], shape,
+            ).astype(np_.intp, )
+        return self._raveled[key]
 
     @classmethod
-    def _for_single_equation(
+    def for_equations(
         cls,
-        tokens_in_equation_on_rhs: in_.Tokens,
-        tokens_in_columns_on_lhs: in_.Tokens,
-        rhs_offset: int,
-        lhs_row: int,
+        eids: list[int],
+        eid_to_wrt_tokens: dict[int, Any],
+        tokens_in_columns_on_lhs: list[Any],
+        eid_to_rhs_offset: dict[int, int],
         /,
         rhs_column: int,
         lhs_column_offset: int,
     ) -> Self:
         """
+        Create the map in a single pass over the equations, looking up the
+        lhs column of each wrt token in a dict; None tokens in the columns
+        are skipped
         """
-        index_func = lambda t: lhs_column_offset + tokens_in_columns_on_lhs.index(t)
-        raw_map = (
-            (lhs_row, index_func(t), rhs_row, rhs_column) 
-            for rhs_row, t in enumerate(tokens_in_equation_on_rhs, start=rhs_offset)
-            if t in tokens_in_columns_on_lhs
-        )
-        # Collect all lhr_rows, all lhs_columns, all rhs_rows, all rhs_columns
-        raw_map = zip(*raw_map)
-        self = cls()
-        try:
-            self.lhs = (list(next(raw_map)), list(next(raw_map)))
-            self.rhs = (list(next(raw_map)), list(next(raw_map)))
-        except:
-            self.lhs = ([], [])
-            self.rhs = ([], [])
-        # Equivalent to:
-        # self = cls()
-        # for rhs_row, t in enumerate(tokens_in_equation_on_rhs, start=rhs_offset):
-        #     if t in tokens_in_columns_on_lhs:
-        #         lhs_column = tokens_in_columns_on_lhs.index_func(t)
-        #         self.append((lhs_row, lhs_column), (rhs_row, 0))
-        return self
+        token_to_column = {}
+        for column, t in enumerate(tokens_in_columns_on_lhs, start=lhs_column_offset):
+            if t is not None:
+                token_to_column.setdefault(t, column)
+        lhs_rows, lhs_columns, rhs_rows = [], [], []
+        for lhs_row, eid in enumerate(eids):
+            for rhs_row, t in enumerate(eid_to_wrt_tokens[eid], start=eid_to_rhs_offset[eid]):
+                lhs_column = token_to_column.get(t)
+                if lhs_column is not None:
+                    lhs_rows.append(lhs_row)
+                    lhs_columns.append(lhs_column)
+                    rhs_rows.append(rhs_row)
+        return cls((lhs_rows, lhs_columns), (rhs_rows, [rhs_column]*len(rhs_rows)))
 
     @classmethod
     def constant_vector(
@@ -131,10 +150,7 @@ class ArrayMap:
         """
         """
         num_equations = len(eids)
-        self = cls()
-        self.lhs = (list(range(num_equations)), [0]*num_equations)
-        self.rhs = (list(eids), [0]*num_equations)
-        return self
+        return cls((range(num_equations), [0]*num_equations), (eids, [0]*num_equations))
     #]
 
 
@@ -142,10 +158,11 @@ def merge_array_maps(maps: Iterable[ArrayMap]) -> ArrayMap:
     """
     """
     #[
-    stacked_map = ArrayMap()
-    for m in maps:
-        stacked_map.merge_with(m)
-    return stacked_map
+    maps = list(maps)
+    return ArrayMap(
+        tuple(_concatenate(m.lhs[i] for m in maps) for i in (0, 1)),
+        tuple(_concatenate(m.rhs[i] for m in maps) for i in (0, 1)),
+    )
     #]
 
 
@@ -166,3 +183,11 @@ def create_eid_to_rhs_offset(
     return dict(zip(eids, rhs_offsets))
 
 
+def _index_array(indices: Iterable[int], /, ) -> np_.ndarray:
+    if isinstance(indices, np_.ndarray):
+        return indices.astype(_INDEX_DTYPE, copy=False, )
+    return np_.fromiter(indices, dtype=_INDEX_DTYPE, )
+
+
+def _concatenate(arrays: Iterable[np_.ndarray], /, ) -> np_.ndarray:
+    return np_.concatenate([_index_array(()), *arrays], )
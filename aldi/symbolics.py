@@ -0,0 +1,266 @@
+"""
+Symbolic differentiation of equation xtrings into straight-line source
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Self, NoReturn, Callable, NamedTuple, )
+from numbers import (Number, )
+import ast as as_
+import numpy as np_
+
+from .. import (incidence as in_, compilers as cm_, )
+#]
+
+
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+# Exposure
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+
+
+class NonsymbolicExpression(Exception):
+    """
+    Raised when an xtring contains an expression that cannot be
+    differentiated symbolically, e.g. a call to a custom function
+    """
+    pass
+
+
+class Derivative(NamedTuple):
+    """
+    Source of the value and the nonzero derivatives of one equation
+    ----------------------------------------------------------------
+    * value -- source of the expression holding the value
+    * diffs -- source of the nonzero derivatives keyed by position of the
+    wrt token
+    """
+    value: str
+    diffs: dict[int, str]
+
+
+class SymbolicDifferentiator:
+    """
+    Differentiate xtrings into straight-line Python/NumPy statements
+    ----------------------------------------------------------------
+    * lines -- statements emitted so far, shared by all differentiated xtrings
+    * _t_zero -- column of the data context holding time t
+    * _qid_to_logly -- log status of quantities; derivatives w.r.t. log
+    variables are taken w.r.t. their logs
+
+    The statements read the data context from x[..., qid, column] and the
+    steady array from L[..., qid], so that any leading (variant) axes carry
+    through
+    """
+    #[
+    def __init__(
+        self,
+        t_zero: int,
+        qid_to_logly: dict[int, bool],
+        /,
+    ) -> NoReturn:
+        self.lines = []
+        self._t_zero = t_zero
+        self._qid_to_logly = qid_to_logly
+        self._wrt_tokens = None
+
+    def differentiate(
+        self,
+        xtring: str,
+        wrt_tokens: in_.Tokens,
+        /,
+    ) -> Derivative:
+        """
+        Emit statements evaluating an xtring (with no equation references)
+        and its derivatives w.r.t. the wrt tokens
+        """
+        self._wrt_tokens = { t: i for i, t in enumerate(wrt_tokens) }
+        node = as_.parse(xtring.strip(), mode="eval", ).body
+        return self._compile(node, )
+
+    def _compile(self, node: as_.AST, /, ) -> Derivative:
+        match node:
+            case as_.Constant(value=value) if isinstance(value, Number):
+                return Derivative(_literal(value, ), {}, )
+            case as_.Subscript(value=as_.Name(id="x"), slice=as_.Tuple(elts=[as_.Constant(value=qid), as_.BinOp(left=as_.Name(id="t"), op=op, right=as_.Constant(value=shift))])):
+                return self._compile_token(qid, shift if isinstance(op, as_.Add) else -shift, )
+            case as_.Subscript(value=as_.Name(id="L"), slice=as_.Constant(value=qid)):
+                return Derivative(self._emit(f"L[..., {int(qid)}]", ), {}, )
+            case as_.UnaryOp(op=as_.UAdd(), operand=operand):
+                return self._compile(operand, )
+            case as_.UnaryOp(op=as_.USub(), operand=operand):
+                return self._compile_neg(self._compile(operand, ), )
+            case as_.BinOp(left=left, op=op, right=right) if type(op) in _BINARY_RULES:
+                return _BINARY_RULES[type(op)](self, self._compile(left, ), self._compile(right, ), )
+            case as_.Call(func=as_.Name(id=name), args=[arg], keywords=[]) if name in _UNARY_RULES:
+                return _UNARY_RULES[name](self, self._compile(arg, ), )
+            case as_.Call(func=as_.Name(id=name), args=[arg, *bound], keywords=[]) if name in _BOUND_FUNCTIONS:
+                return self._compile_bound(name, self._compile(arg, ), bound, )
+        raise NonsymbolicExpression(as_.unparse(node, ))
+
+    def _emit(self, expression: str, /, ) -> str:
+        """
+        Emit an assignment of an expression to a new local name
+        """
+        name = f"_s{len(self.lines)}"
+        self.lines.append(f"{name} = {expression}")
+        return name
+
+    def _compile_token(self, qid: int, shift: int, /, ) -> Derivative:
+        value = self._emit(f"x[..., {qid}, {self._t_zero + shift}]", )
+        index = self._wrt_tokens.get(in_.Token(qid, shift), )
+        if index is None:
+            return Derivative(value, {}, )
+        # d/d(log x) = x * d/dx
+        return Derivative(value, { index: value if self._qid_to_logly.get(qid, False) else "1.0" }, )
+
+    def _compile_neg(self, a: Derivative, /, ) -> Derivative:
+        return Derivative(
+            self._emit(f"-{a.value}", ),
+            { k: self._emit(f"-{d}", ) for k, d in a.diffs.items() },
+        )
+
+    def _compile_add(self, a: Derivative, b: Derivative, /, ) -> Derivative:
+        diffs = {}
+        for k in _union_keys(a.diffs, b.diffs, ):
+            da, db = a.diffs.get(k, ), b.diffs.get(k, )
+            diffs[k] = self._emit(f"{da} + {db}", ) if da and db else (da or db)
+        return Derivative(self._emit(f"{a.value} + {b.value}", ), diffs, )
+
+    def _compile_sub(self, a: Derivative, b: Derivative, /, ) -> Derivative:
+        diffs = {}
+        for k in _union_keys(a.diffs, b.diffs, ):
+            da, db = a.diffs.get(k, ), b.diffs.get(k, )
+            diffs[k] = self._emit(f"{da} - {db}", ) if da and db else (da or self._emit(f"-{db}", ))
+        return Derivative(self._emit(f"{a.value} - {b.value}", ), diffs, )
+
+    def _compile_mul(self, a: Derivative, b: Derivative, /, ) -> Derivative:
+        diffs = {}
+        for k in _union_keys(a.diffs, b.diffs, ):
+            da, db = a.diffs.get(k, ), b.diffs.get(k, )
+            terms = []
+            if da:
+                terms.append(_product(da, b.value, ))
+            if db:
+                terms.append(_product(a.value, db, ))
+            diffs[k] = self._emit(" + ".join(terms), )
+        return Derivative(self._emit(f"{a.value} * {b.value}", ), diffs, )
+
+    def _compile_div(self, a: Derivative, b: Derivative, /, ) -> Derivative:
+        diffs = {}
+        for k in _union_keys(a.diffs, b.diffs, ):
+            da, db = a.diffs.get(k, ), b.diffs.get(k, )
+            if da and db:
+                diffs[k] = self._emit(f"({da} * {b.value} - {a.value} * {db}) / ({b.value} ** 2)", )
+            elif da:
+                diffs[k] = self._emit(f"{da} / {b.value}", )
+            else:
+                diffs[k] = self._emit(f"-{a.value} * {db} / ({b.value} ** 2)", )
+        return Derivative(self._emit(f"{a.value} / {b.value}", ), diffs, )
+
+    def _compile_pow(self, a: Derivative, b: Derivative, /, ) -> Derivative:
+        value = self._emit(f"{a.value} ** {b.value}", )
+        log_base = self._emit(f"_log_base({a.value})", ) if b.diffs else None
+        diffs = {}
+        for k in _union_keys(a.diffs, b.diffs, ):
+            da, db = a.diffs.get(k, ), b.diffs.get(k, )
+            terms = []
+            if da:
+                terms.append(f"{b.value} * {a.value} ** ({b.value} - 1) * {da}")
+            if db:
+                terms.append(f"{value} * {log_base} * {db}")
+            diffs[k] = self._emit(" + ".join(terms), )
+        return Derivative(value, diffs, )
+
+    def _compile_log(self, a: Derivative, /, ) -> Derivative:
+        return Derivative(
+            self._emit(f"_np.log({a.value})", ),
+            { k: self._emit(f"{d} / {a.value}", ) for k, d in a.diffs.items() },
+        )
+
+    def _compile_exp(self, a: Derivative, /, ) -> Derivative:
+        value = self._emit(f"_np.exp({a.value})", )
+        return Derivative(value, { k: self._emit(_product(value, d, ), ) for k, d in a.diffs.items() }, )
+
+    def _compile_sqrt(self, a: Derivative, /, ) -> Derivative:
+        value = self._emit(f"_np.sqrt({a.value})", )
+        return Derivative(value, { k: self._emit(f"0.5 / {value} * {d}", ) for k, d in a.diffs.items() }, )
+
+    def _compile_bound(self, name: str, a: Derivative, bound: list[as_.AST], /, ) -> Derivative:
+        """
+        Differentiate maximum(a, floor) or minimum(a, ceiling) with a
+        literal bound; the derivative is halved where a hits the bound
+        """
+        bound = _literal(float(cm_.evaluate_constant_argument(bound[0], NonsymbolicExpression, )) if bound else 0, )
+        value = self._emit(f"_np.{name}({a.value}, {bound})", )
+        if not a.diffs:
+            return Derivative(value, {}, )
+        inside = ">" if name == "maximum" else "<"
+        multiplier = self._emit(
+            f"_np.where({a.value} {inside} {bound}, 1.0, _np.where({a.value} == {bound}, 0.5, 0.0))",
+        )
+        return Derivative(value, { k: self._emit(f"{multiplier} * {d}", ) for k, d in a.diffs.items() }, )
+    #]
+
+
+def create_namespace(custom: dict | None = None, /, ) -> dict[str, Any]:
+    """
+    Create the namespace in which the emitted statements are executed
+    """
+    return (custom or {}) | { "_np": np_, "_log_base": _log_base, }
+
+
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+# Implementation
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+
+
+def _log_base(base, /, ):
+    """
+    Log of the base of an exponential; a zero base has zero derivative
+    """
+    return np_.log(np_.where(np_.not_equal(base, 0, ), base, 1, ), )
+
+
+def _literal(value: Number, /, ) -> str:
+    """
+    Source of a float literal, parenthesized if negative
+    """
+    value = float(value)
+    return repr(value) if value >= 0 else f"({value!r})"
+
+
+def _union_keys(a: dict, b: dict, /, ) -> list:
+    return sorted(set(a) | set(b))
+
+
+def _product(a: str, b: str, /, ) -> str:
+    """
+    Source of a product, dropping unit factors
+    """
+    if a == "1.0":
+        return b
+    if b == "1.0":
+        return a
+    return f"{a} * {b}"
+
+
+_BINARY_RULES = {
+    as_.Add: SymbolicDifferentiator._compile_add,
+    as_.Sub: SymbolicDifferentiator._compile_sub,
+    as_.Mult: SymbolicDifferentiator._compile_mul,
+    as_.Div: SymbolicDifferentiator._compile_div,
+    as_.Pow: SymbolicDifferentiator._compile_pow,
+}
+
+
+_UNARY_RULES = {
+    "log": SymbolicDifferentiator._compile_log,
+    "exp": SymbolicDifferentiator._compile_exp,
+    "sqrt": SymbolicDifferentiator._compile_sqrt,
+}
+
+
+_BOUND_FUNCTIONS = ("maximum", "minimum", )
+
@@ -0,0 +1,482 @@
+"""
+Flat operation tapes for the algorithmic differentiator
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Self, NoReturn, Callable, NamedTuple, )
+from numbers import (Number, )
+from collections import (OrderedDict, )
+import ast as as_
+import copy as co_
+import threading as th_
+import numpy as np_
+
+from .. import (compilers as cm_, )
+#]
+
+
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+# Exposure
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+
+
+"""
+Maximum number of compiled programs (leading shapes) kept per thread
+"""
+_MAX_PROGRAMS = 4
+
+
+class Tape:
+    """
+    Flat sequence of operations compiled from one aldi xtring
+    -----------------------------------------------------------
+    * _node -- parsed AST of the xtring
+    * _atoms -- dictionary of token atoms referenced by the xtring
+    * _diff_shape -- shape of the output diff for one variant
+    * _programs -- per-thread compiled programs keyed by the leading
+    (variant) shape of the data context, at most _MAX_PROGRAMS per thread,
+    least recently used first; each thread replays its own buffers, so
+    that tapes can be replayed concurrently, and the programs of a thread
+    are dropped when the thread finishes
+    """
+    #[
+    __slots__ = (
+        "_node", "_atoms", "_diff_shape", "_programs",
+    )
+
+    @classmethod
+    def from_xtring(
+        cls,
+        xtring: str,
+        atoms: dict[str, Any],
+        diff_shape: tuple[int, int],
+        /,
+    ) -> Self:
+        """
+        Compile an aldi xtring into a tape; raise UntapeableExpression if
+        the xtring contains constructs the tape cannot replay
+        """
+        self = cls()
+        self._node = as_.parse(xtring, mode="eval", ).body
+        self._atoms = atoms
+        self._diff_shape = diff_shape
+        self._programs = th_.local()
+        self._get_program((), )
+        return self
+
+    def __deepcopy__(self, memo, /, ) -> Self:
+        """
+        Copy the tape without its compiled programs, whose operations are
+        bound to the buffers of this tape; they are recompiled on first use
+        """
+        new = type(self)()
+        new._node = self._node
+        new._atoms = co_.deepcopy(self._atoms, memo, )
+        new._diff_shape = self._diff_shape
+        new._programs = th_.local()
+        return new
+
+    def replay(
+        self,
+        data_context: np_.ndarray,
+        logly_context: dict[int, bool],
+        steady_array: np_.ndarray | None,
+        /,
+    ) -> tuple[np_.ndarray, np_.ndarray]:
+        """
+        Run the tape and return the final diff and value
+        """
+        lead_shape = data_context.shape[:-2]
+        ops, values, diffs, output, state = self._get_program(lead_shape, )
+        state[0], state[1], state[2] = data_context, logly_context, steady_array
+        for op in ops:
+            op()
+        state[0], state[1], state[2] = None, None, None
+        value, diff = values[output], diffs[output]
+        return (
+            diff if diff is not None else np_.zeros(lead_shape + self._diff_shape, dtype=float, ),
+            value if not isinstance(value, Number) else np_.full(lead_shape + (1, self._diff_shape[1], ), value, dtype=float, ),
+        )
+
+    def _get_program(self, lead_shape: tuple[int, ...], /, ) -> _Program:
+        """
+        Get the program for data contexts with the given leading shape in
+        the current thread, compiling it with freshly allocated buffers on
+        first use
+        """
+        programs = getattr(self._programs, "programs", None, )
+        if programs is None:
+            programs = self._programs.programs = OrderedDict()
+        if lead_shape in programs:
+            programs.move_to_end(lead_shape, )
+            return programs[lead_shape]
+        state = [None, None, None, ]
+        compiler = _TapeCompiler(self._atoms, self._diff_shape, lead_shape, state, )
+        output = compiler.compile(self._node, )
+        programs[lead_shape] = _Program(compiler.ops, compiler.values, compiler.diffs, output, state, )
+        while len(programs) > _MAX_PROGRAMS:
+            programs.popitem(last=False, )
+        return programs[lead_shape]
+    #]
+
+
+class UntapeableExpression(Exception):
+    """
+    Raised when an xtring contains constructs the tape cannot replay
+    """
+    pass
+
+
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+# Implementation
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+
+
+class _Program(NamedTuple):
+    """
+    Operations and buffers of a tape compiled for one leading shape
+    """
+    ops: list[Callable]
+    values: list[np_.ndarray | Number]
+    diffs: list[np_.ndarray | None]
+    output: int
+    state: list
+
+
+_UNARY_FUNCTIONS = ("log", "exp", "sqrt", )
+
+
+_FLOOR_FUNCTIONS = ("maximum", "minimum", )
+
+
+class _TapeCompiler:
+    """
+    Walk the AST of an xtring and emit tape operations in evaluation order
+    """
+    #[
+    def __init__(
+        self,
+        atoms: dict[str, Any],
+        diff_shape: tuple[int, int],
+        lead_shape: tuple[int, ...],
+        state: list,
+        /,
+    ) -> NoReturn:
+        self.ops = []
+        self.values = []
+        self.diffs = []
+        self._atoms = atoms
+        self._value_shape = lead_shape + (1, diff_shape[1], )
+        self._diff_shape = lead_shape + diff_shape
+        self._state = state
+
+    def compile(self, node: as_.AST, /, ) -> int:
+        """
+        Compile an AST node and return the slot holding its result
+        """
+        match node:
+            case as_.Constant(value=value) if isinstance(value, Number):
+                return self._new_constant(value, )
+            case as_.Subscript(value=as_.Name(id="x"), slice=as_.Constant(value=key)):
+                return self._compile_token(key, )
+            case as_.Subscript(value=as_.Name(id="L"), slice=as_.Constant(value=qid)):
+                return self._compile_steady_ref(int(qid), )
+            case as_.UnaryOp(op=as_.UAdd(), operand=operand):
+                return self.compile(operand, )
+            case as_.UnaryOp(op=as_.USub(), operand=operand):
+                return self._compile_neg(self.compile(operand, ), )
+            case as_.BinOp(left=left, op=op, right=right):
+                return self._compile_binary(type(op), self.compile(left, ), self.compile(right, ), )
+            case as_.Call(func=as_.Name(id=name), args=[arg], keywords=[]) if name in _UNARY_FUNCTIONS:
+                return self._compile_unary(name, self.compile(arg, ), )
+            case as_.Call(func=as_.Name(id=name), args=[arg, *floor], keywords=[]) if name in _FLOOR_FUNCTIONS:
+                return self._compile_floor(name, self.compile(arg, ), floor, )
+        raise UntapeableExpression(as_.unparse(node, ))
+
+    def _new_slot(self, has_diff: bool, /, ) -> int:
+        self.values.append(np_.empty(self._value_shape, dtype=float, ))
+        self.diffs.append(np_.empty(self._diff_shape, dtype=float, ) if has_diff else None)
+        return len(self.values) - 1
+
+    def _new_constant(self, value: Number, /, ) -> int:
+        self.values.append(value)
+        self.diffs.append(None)
+        return len(self.values) - 1
+
+    def _is_constant(self, slot: int, /, ) -> bool:
+        return isinstance(self.values[slot], Number)
+
+    def _compile_token(self, key: str, /, ) -> int:
+        """
+        Load the value of a token from the data context; tokens w.r.t.
+        which the equation is differentiated also load their unit diff,
+        scaled by the value for log variables
+        """
+        atom = self._atoms[key]
+        base_diff = atom._diff if not isinstance(atom._diff, Number) else None
+        o = self._new_slot(base_diff is not None, )
+        vo, do = self.values[o], self.diffs[o]
+        data_index, logly_index, state = atom._data_index, atom._logly_index, self._state
+        if do is None:
+            def op():
+                vo[...] = state[0][data_index]
+        else:
+            def op():
+                vo[...] = state[0][data_index]
+                if state[1].get(logly_index, False):
+                    np_.multiply(base_diff, vo, out=do, )
+                else:
+                    do[...] = base_diff
+        self.ops.append(op)
+        return o
+
+    def _compile_steady_ref(self, qid: int, /, ) -> int:
+        o = self._new_slot(False, )
+        vo, state = self.values[o], self._state
+        def op():
+            vo[...] = state[2][..., qid, None, None]
+        self.ops.append(op)
+        return o
+
+    def _compile_neg(self, a: int, /, ) -> int:
+        if self._is_constant(a, ):
+            return self._new_constant(-self.values[a], )
+        va, da = self.values[a], self.diffs[a]
+        o = self._new_slot(da is not None, )
+        vo, do = self.values[o], self.diffs[o]
+        if da is None:
+            def op():
+                np_.negative(va, out=vo, )
+        else:
+            def op():
+                np_.negative(va, out=vo, )
+                np_.negative(da, out=do, )
+        self.ops.append(op)
+        return o
+
+    def _compile_binary(self, op_type: type, a: int, b: int, /, ) -> int:
+        if self._is_constant(a, ) and self._is_constant(b, ):
+            try:
+                return self._new_constant(cm_.BINARY_FOLDERS[op_type](self.values[a], self.values[b], ), )
+            except (ArithmeticError, ValueError, ):
+                # Leave the failing constant to the Atom path
+                raise UntapeableExpression(op_type.__name__)
+        builder = _BINARY_BUILDERS.get(op_type, )
+        if builder is None:
+            raise UntapeableExpression(op_type.__name__)
+        va, da = self.values[a], self.diffs[a]
+        vb, db = self.values[b], self.diffs[b]
+        o = self._new_slot((da is not None) or (db is not None), )
+        vo, do = self.values[o], self.diffs[o]
+        self.ops.append(builder(va, da, vb, db, vo, do, ))
+        return o
+
+    def _compile_unary(self, name: str, a: int, /, ) -> int:
+        if self._is_constant(a, ):
+            return self._new_constant(float(getattr(np_, name)(self.values[a])), )
+        va, da = self.values[a], self.diffs[a]
+        o = self._new_slot(da is not None, )
+        vo, do = self.values[o], self.diffs[o]
+        self.ops.append(_UNARY_BUILDERS[name](va, da, vo, do, ))
+        return o
+
+    def _compile_floor(self, name: str, a: int, floor: list[as_.AST], /, ) -> int:
+        floor = cm_.evaluate_constant_argument(floor[0], UntapeableExpression, ) if floor else 0
+        if self._is_constant(a, ):
+            return self._new_constant(float(getattr(np_, name)(self.values[a], floor, )), )
+        va, da = self.values[a], self.diffs[a]
+        o = self._new_slot(da is not None, )
+        vo, do = self.values[o], self.diffs[o]
+        self.ops.append(_build_floor(name, floor, va, da, vo, do, ))
+        return o
+    #]
+
+
+def _build_add(va, da, vb, db, vo, do, /, ) -> Callable:
+    #[
+    if da is not None and db is not None:
+        def op():
+            np_.add(va, vb, out=vo, )
+            np_.add(da, db, out=do, )
+    elif da is not None:
+        def op():
+            np_.add(va, vb, out=vo, )
+            do[...] = da
+    elif db is not None:
+        def op():
+            np_.add(va, vb, out=vo, )
+            do[...] = db
+    else:
+        def op():
+            np_.add(va, vb, out=vo, )
+    return op
+    #]
+
+
+def _build_sub(va, da, vb, db, vo, do, /, ) -> Callable:
+    #[
+    if da is not None and db is not None:
+        def op():
+            np_.subtract(va, vb, out=vo, )
+            np_.subtract(da, db, out=do, )
+    elif da is not None:
+        def op():
+            np_.subtract(va, vb, out=vo, )
+            do[...] = da
+    elif db is not None:
+        def op():
+            np_.subtract(va, vb, out=vo, )
+            np_.negative(db, out=do, )
+    else:
+        def op():
+            np_.subtract(va, vb, out=vo, )
+    return op
+    #]
+
+
+def _build_mul(va, da, vb, db, vo, do, /, ) -> Callable:
+    #[
+    if da is not None and db is not None:
+        def op():
+            np_.multiply(va, vb, out=vo, )
+            np_.multiply(da, vb, out=do, )
+            np_.add(do, va * db, out=do, )
+    elif da is not None:
+        def op():
+            np_.multiply(va, vb, out=vo, )
+            np_.multiply(da, vb, out=do, )
+    elif db is not None:
+        def op():
+            np_.multiply(va, vb, out=vo, )
+            np_.multiply(va, db, out=do, )
+    else:
+        def op():
+            np_.multiply(va, vb, out=vo, )
+    return op
+    #]
+
+
+def _build_div(va, da, vb, db, vo, do, /, ) -> Callable:
+    #[
+    if da is not None and db is not None:
+        def op():
+            np_.divide(va, vb, out=vo, )
+            np_.multiply(da, vb, out=do, )
+            np_.subtract(do, va * db, out=do, )
+            np_.divide(do, vb**2, out=do, )
+    elif da is not None:
+        def op():
+            np_.divide(va, vb, out=vo, )
+            np_.divide(da, vb, out=do, )
+    elif db is not None:
+        def op():
+            np_.divide(va, vb, out=vo, )
+            np_.multiply(-va, db, out=do, )
+            np_.divide(do, vb**2, out=do, )
+    else:
+        def op():
+            np_.divide(va, vb, out=vo, )
+    return op
+    #]
+
+
+def _build_pow(va, da, vb, db, vo, do, /, ) -> Callable:
+    """
+    Differentiate va**vb as power function in va plus exponential function
+    in vb; the exponential part is zero wherever the base is zero
+    """
+    #[
+    def exponential_factor():
+        with np_.errstate(divide="ignore", invalid="ignore", ):
+            factor = vo * np_.log(va)
+        return np_.where(np_.equal(va, 0), 0, factor)
+    #
+    if da is not None and db is not None:
+        def op():
+            np_.power(va, vb, out=vo, )
+            np_.multiply(da, vb * np_.power(va, vb - 1), out=do, )
+            np_.add(do, exponential_factor() * db, out=do, )
+    elif da is not None:
+        def op():
+            np_.power(va, vb, out=vo, )
+            np_.multiply(da, vb * np_.power(va, vb - 1), out=do, )
+    elif db is not None:
+        def op():
+            np_.power(va, vb, out=vo, )
+            np_.multiply(exponential_factor(), db, out=do, )
+    else:
+        def op():
+            np_.power(va, vb, out=vo, )
+    return op
+    #]
+
+
+_BINARY_BUILDERS = {
+    as_.Add: _build_add,
+    as_.Sub: _build_sub,
+    as_.Mult: _build_mul,
+    as_.Div: _build_div,
+    as_.Pow: _build_pow,
+}
+
+
+def _build_log(va, da, vo, do, /, ) -> Callable:
+    #[
+    if da is None:
+        return lambda: np_.log(va, out=vo, )
+    def op():
+        np_.log(va, out=vo, )
+        np_.multiply(1 / va, da, out=do, )
+    return op
+    #]
+
+
+def _build_exp(va, da, vo, do, /, ) -> Callable:
+    #[
+    if da is None:
+        return lambda: np_.exp(va, out=vo, )
+    def op():
+        np_.exp(va, out=vo, )
+        np_.multiply(vo, da, out=do, )
+    return op
+    #]
+
+
+def _build_sqrt(va, da, vo, do, /, ) -> Callable:
+    #[
+    if da is None:
+        return lambda: np_.sqrt(va, out=vo, )
+    def op():
+        np_.sqrt(va, out=vo, )
+        np_.multiply(0.5 / vo, da, out=do, )
+    return op
+    #]
+
+
+_UNARY_BUILDERS = {
+    "log": _build_log,
+    "exp": _build_exp,
+    "sqrt": _build_sqrt,
+}
+
+
+def _build_floor(name, floor, va, da, vo, do, /, ) -> Callable:
+    """
+    Differentiate maximum(va, floor) or minimum(va, floor) with the
+    derivative halved at the kink
+    """
+    #[
+    func = getattr(np_, name)
+    sign = 1 if name == "maximum" else -1
+    if da is None:
+        return lambda: func(va, floor, out=vo, )
+    def op():
+        func(va, floor, out=vo, )
+        distance = sign * (va - floor)
+        multiplier = np_.where(distance > 0, 1.0, np_.where(distance == 0, 0.5, 0.0))
+        np_.multiply(da, multiplier, out=do, )
+    return op
+    #]
@@ -0,0 +1,455 @@
+"""
+Compile passes over evaluator strings
+
+An evaluator string is a lambda expression whose body evaluates all
+equations (xtrings) at once, see equations.create_evaluator_func_string.
+The pass implemented here rewrites the body before it is evaluated:
+
+* constant folding -- subtrees made of number literals only are
+replaced with their values
+
+* common-subexpression elimination -- subtrees occurring more than once
+(quantity references, arithmetic, calls to named functions) are computed
+once, at their first occurrence, and bound to a local name with an
+assignment expression; subsequent occurrences refer to that name
+
+Parameter-only terms shared by several equations are therefore computed
+once per call. The rewritten string is still a single lambda expression so
+that it can be evaluated exactly as before.
+
+Large sets of xtrings are compiled in chunks, see ChunkedEvaluator; the
+code object of each chunk is cached by the source of the chunk, so that
+identical chunks (e.g. in the syntax check and in the evaluators built
+afterwards) are compiled only once.
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Self, Callable, )
+from collections.abc import (Iterable, )
+from types import (CodeType, )
+from numbers import (Number, )
+import ast as as_
+import operator as op_
+import math as mt_
+import marshal as ma_
+import threading as th_
+import concurrent.futures as cf_
+#]
+
+
+EVALUATOR_PREAMBLE = "lambda x, t, L: "
+
+
+"""
+Largest number of bits of an integer power that is folded; Python computes
+integer powers exactly, so unbounded folding of e.g. 9**9**9 never ends
+"""
+_MAX_FOLDED_INT_BITS = 128
+
+
+def _fold_pow(base: Number, exponent: Number, /, ) -> Number:
+    """
+    Power of two numbers for constant folding; raise OverflowError instead
+    of computing an integer power larger than _MAX_FOLDED_INT_BITS bits
+    """
+    #[
+    if (
+        isinstance(base, int) and isinstance(exponent, int) and exponent > 0
+        and (base.bit_length() - 1) * exponent >= _MAX_FOLDED_INT_BITS
+    ):
+        raise OverflowError("Integer power too large to fold")
+    return op_.pow(base, exponent, )
+    #]
+
+
+"""
+Functions folding binary operations on numbers, keyed by the AST operator;
+they raise ArithmeticError or ValueError when an operation is not folded
+"""
+BINARY_FOLDERS = {
+    as_.Add: op_.add,
+    as_.Sub: op_.sub,
+    as_.Mult: op_.mul,
+    as_.Div: op_.truediv,
+    as_.Pow: _fold_pow,
+}
+
+
+_CSE_NAME = "_cse_{}"
+_CHUNK_SIZE = 250
+_MAX_CACHED_CHUNKS = 4096
+
+
+def evaluate_constant_argument(
+    node: as_.AST,
+    exception_type: type[Exception],
+    /,
+) -> Number:
+    """
+    Evaluate a literal numeric argument, such as the floor in maximum(x, 0);
+    raise exception_type with the source of the node if it is not a number
+    """
+    #[
+    try:
+        value = as_.literal_eval(node, )
+    except ValueError:
+        raise exception_type(as_.unparse(node, ))
+    if not isinstance(value, Number):
+        raise exception_type(as_.unparse(node, ))
+    return value
+    #]
+
+
+def optimize_evaluator_string(func_string: str, /, ) -> str:
+    """
+    Fold constants and eliminate common subexpressions in an evaluator
+    string; strings that cannot be parsed are returned unchanged so that
+    the error surfaces where the string is evaluated
+    """
+    #[
+    try:
+        tree = as_.parse(func_string, mode="eval", )
+    except SyntaxError:
+        return func_string
+    tree = _ConstantFolder().visit(tree, )
+    if isinstance(tree.body, as_.Lambda):
+        tree.body.body = _eliminate_common_subexpressions(tree.body.body, )
+    return as_.unparse(as_.fix_missing_locations(tree), )
+    #]
+
+
+class ChunkedEvaluator:
+    """
+    Evaluator lambda compiled in chunks of xtrings
+    -----------------------------------------------
+    * func_strings -- optimized lambda strings, one per chunk
+    * _codes -- compiled code objects, one per chunk
+
+    Binding the chunks to a namespace creates one function with the
+    signature (x, t, L) returning the list of all xtring values, exactly as
+    the single evaluator lambda would
+    """
+    #[
+    __slots__ = ("func_strings", "_codes", )
+
+    @classmethod
+    def from_xtrings(
+        cls,
+        xtrings: Iterable[str],
+        /,
+        chunk_size: int = _CHUNK_SIZE,
+        workers: int | None = None,
+        separate: Iterable[int] = (),
+    ) -> Self:
+        """
+        Compile xtrings in chunks of chunk_size; chunks not found in the
+        cache are compiled in a pool of worker processes if workers > 1;
+        SyntaxError is raised for chunks that fail to compile; the xtrings
+        at the separate indexes are compiled in chunks apart from the
+        others, so that two lists differing only at these indexes share the
+        cached chunks of all the other xtrings
+        """
+        xtrings = list(xtrings)
+        sources = [
+            EVALUATOR_PREAMBLE + "[" + " , ".join(xtrings[start:end]) + "]"
+            for start, end in _split_into_chunks(len(xtrings), chunk_size, set(separate), )
+        ]
+        _compile_missing_chunks(sources, workers, )
+        compiled = [ _get_compiled_chunk(s, ) for s in sources ]
+        self = cls()
+        self.func_strings = tuple(c[0] for c in compiled)
+        self._codes = tuple(c[1] for c in compiled)
+        return self
+
+    @property
+    def num_chunks(self, /, ) -> int:
+        return len(self._codes)
+
+    def bind(self, namespace: dict, /, ) -> Callable:
+        """
+        Create the evaluator function with the names in the xtrings
+        resolved in a namespace
+        """
+        funcs = tuple(eval(code, namespace, ) for code in self._codes)
+        if len(funcs) == 1:
+            return funcs[0]
+        def func(x, t, L, ):
+            return [ y for f in funcs for y in f(x, t, L, ) ]
+        return func
+    #]
+
+
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+# Implementation
+#••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
+
+
+_UNARY_FOLDERS = {
+    as_.UAdd: op_.pos,
+    as_.USub: op_.neg,
+}
+
+
+def _is_number(node: as_.AST, /, ) -> bool:
+    return (
+        isinstance(node, as_.Constant)
+        and isinstance(node.value, Number)
+        and not isinstance(node.value, bool)
+    )
+
+
+def _is_signed_number(node: as_.AST, /, ) -> bool:
+    """
+    True for number literals and number literals with a unary sign
+    """
+    return _is_number(node) or (
+        isinstance(node, as_.UnaryOp)
+        and type(node.op) in _UNARY_FOLDERS
+        and _is_number(node.operand)
+    )
+
+
+def _get_number(node: as_.AST, /, ) -> Number:
+    if _is_number(node):
+        return node.value
+    return _UNARY_FOLDERS[type(node.op)](node.operand.value, )
+
+
+class _ConstantFolder(as_.NodeTransformer):
+    """
+    Replace arithmetic on number literals with its value; a sign applied
+    directly to a literal is kept as is, and negative values are produced
+    as a unary minus on a literal, so that unparsing keeps the precedence,
+    e.g. (-2)**x is not turned into -2**x
+    """
+    #[
+    def visit_BinOp(self, node: as_.BinOp, /, ) -> as_.AST:
+        self.generic_visit(node, )
+        func = BINARY_FOLDERS.get(type(node.op), )
+        if func and _is_signed_number(node.left) and _is_signed_number(node.right):
+            return _fold(node, func, _get_number(node.left), _get_number(node.right), )
+        return node
+
+    def visit_UnaryOp(self, node: as_.UnaryOp, /, ) -> as_.AST:
+        self.generic_visit(node, )
+        func = _UNARY_FOLDERS.get(type(node.op), )
+        if func and _is_signed_number(node.operand) and not _is_number(node.operand):
+            return _fold(node, func, _get_number(node.operand), )
+        return node
+    #]
+
+
+def _fold(node, func, *args, ):
+    """
+    Evaluate a foldable node, leaving it untouched if the operation fails
+    or produces a non-real number
+    """
+    #[
+    try:
+        value = func(*args, )
+    except (ArithmeticError, ValueError, ):
+        return node
+    if isinstance(value, complex):
+        return node
+    if mt_.copysign(1, value, ) < 0:
+        folded = as_.UnaryOp(op=as_.USub(), operand=as_.Constant(-value, ), )
+    else:
+        folded = as_.Constant(value, )
+    return as_.copy_location(folded, node, )
+    #]
+
+
+"""
+Nodes whose subtrees are not evaluated unconditionally or in a fixed order;
+no subexpressions are taken out of them
+"""
+_OPAQUE_NODES = (
+    as_.IfExp, as_.BoolOp, as_.Lambda, as_.NamedExpr,
+    as_.ListComp, as_.SetComp, as_.DictComp, as_.GeneratorExp,
+)
+
+
+def _is_candidate(node: as_.AST, /, ) -> bool:
+    """
+    True for subtrees worth computing only once
+    """
+    if isinstance(node, (as_.BinOp, as_.Subscript, )):
+        return True
+    if isinstance(node, as_.UnaryOp):
+        return not _is_number(node.operand)
+    if isinstance(node, as_.Call):
+        return isinstance(node.func, as_.Name)
+    return False
+
+
+def _eliminate_common_subexpressions(body: as_.AST, /, ) -> as_.AST:
+    """
+    Bind repeated subexpressions to local names at their first occurrence
+    """
+    #[
+    keys = {}
+    counts = _count_subexpressions(body, keys, None, )
+    #
+    # Occurrences nested inside a repeated subexpression beyond its first
+    # occurrence disappear once the repeated subexpression is replaced;
+    # recount until the set of repeated subexpressions settles
+    while True:
+        repeated = { k for k, n in counts.items() if n > 1 }
+        counts = _count_subexpressions(body, keys, repeated, )
+        if all(counts.get(k, 0) > 1 for k in repeated):
+            break
+    #
+    if not repeated:
+        return body
+    return _Replacer(keys, repeated, ).visit(body, )
+    #]
+
+
+def _count_subexpressions(
+    body: as_.AST,
+    keys: dict[int, str],
+    repeated: set[str] | None,
+    /,
+) -> dict[str, int]:
+    """
+    Count candidate subexpressions in evaluation order, not descending into
+    repeated subexpressions past their first occurrence
+    """
+    #[
+    counts = {}
+    seen = set()
+    def _visit(node, ):
+        if isinstance(node, _OPAQUE_NODES):
+            return
+        if _is_candidate(node):
+            key = keys.setdefault(id(node), as_.dump(node, ), )
+            counts[key] = counts.get(key, 0) + 1
+            if repeated is not None and key in repeated:
+                if key in seen:
+                    return
+                seen.add(key)
+        for child in as_.iter_child_nodes(node, ):
+            _visit(child, )
+    _visit(body, )
+    return counts
+    #]
+
+
+class _Replacer(as_.NodeTransformer):
+    """
+    Bind the first occurrence of each repeated subexpression to a name and
+    refer to the name afterwards
+    """
+    #[
+    def __init__(self, keys, repeated, /, ):
+        self._keys = keys
+        self._repeated = repeated
+        self._names = {}
+
+    def visit(self, node, /, ):
+        if isinstance(node, _OPAQUE_NODES):
+            return node
+        key = self._keys.get(id(node), )
+        if key not in self._repeated:
+            return self.generic_visit(node, )
+        if key in self._names:
+            return as_.copy_location(as_.Name(self._names[key], as_.Load(), ), node, )
+        name = _CSE_NAME.format(len(self._names), )
+        self._names[key] = name
+        node = self.generic_visit(node, )
+        return as_.copy_location(as_.NamedExpr(as_.Name(name, as_.Store(), ), node, ), node, )
+    #]
+
+
+
+"""
+Compiled chunks keyed by their source; each entry is a pair of the
+optimized lambda string and its code object
+"""
+def _split_into_chunks(
+    num_xtrings: int,
+    chunk_size: int,
+    separate: set[int],
+    /,
+) -> list[tuple[int, int]]:
+    """
+    Return the (start, end) ranges of the chunks; a new chunk starts after
+    chunk_size xtrings, and wherever the xtrings switch between separate
+    and not separate
+    """
+    #[
+    ranges = []
+    start = 0
+    for i in range(1, num_xtrings, ):
+        if i - start == chunk_size or ((i in separate) != (i - 1 in separate)):
+            ranges.append((start, i, ), )
+            start = i
+    ranges.append((start, max(num_xtrings, 1), ), )
+    return ranges
+    #]
+
+
+_CHUNK_CACHE: dict[str, tuple[str, CodeType]] = {}
+_CHUNK_CACHE_LOCK = th_.Lock()
+
+
+def _get_compiled_chunk(source: str, /, ) -> tuple[str, CodeType]:
+    """
+    Return the optimized string and code object of a chunk, compiling it
+    if not cached
+    """
+    #[
+    compiled = _CHUNK_CACHE.get(source, )
+    if compiled is None:
+        compiled = _compile_chunk(source, )
+        _store_compiled_chunk(source, compiled, )
+    return compiled
+    #]
+
+
+def _compile_chunk(source: str, /, ) -> tuple[str, CodeType]:
+    #[
+    func_string = optimize_evaluator_string(source, )
+    return func_string, compile(func_string, "<evaluator>", "eval", )
+    #]
+
+
+def _compile_chunk_to_bytes(source: str, /, ) -> tuple[str, bytes]:
+    """
+    Compile a chunk in a worker process; code objects travel back as
+    marshaled bytes
+    """
+    #[
+    func_string, code = _compile_chunk(source, )
+    return func_string, ma_.dumps(code, )
+    #]
+
+
+def _compile_missing_chunks(sources: list[str], workers: int | None, /, ) -> None:
+    """
+    Compile the chunks missing from the cache in a process pool
+    """
+    #[
+    missing = list(dict.fromkeys(s for s in sources if s not in _CHUNK_CACHE))
+    if not workers or workers <= 1 or len(missing) <= 1:
+        return
+    with cf_.ProcessPoolExecutor(max_workers=min(workers, len(missing)), ) as executor:
+        for source, (func_string, code_bytes) in zip(missing, executor.map(_compile_chunk_to_bytes, missing, ), ):
+            _store_compiled_chunk(source, (func_string, ma_.loads(code_bytes, ), ), )
+    #]
+
+
+def _store_compiled_chunk(source: str, compiled: tuple[str, CodeType], /, ) -> None:
+    """
+    Store a compiled chunk, evicting the oldest entries beyond the maximum
+    cache size
+    """
+    #[
+    with _CHUNK_CACHE_LOCK:
+        _CHUNK_CACHE[source] = compiled
+        while len(_CHUNK_CACHE) > _MAX_CACHED_CHUNKS:
+            del _CHUNK_CACHE[next(iter(_CHUNK_CACHE))]
+    #]
@@ -83,6 +83,24 @@ class Dataslab:
         self = cls();
         self.add_from_databank(*args, **kwargs)
         return self
+
+    @classmethod
+    def from_array(
+        cls,
+        data: np_.ndarray,
+        row_names: Iterable[str],
+        column_dates: Iterable[Dater],
+        /,
+    ) -> Self:
+        """
+        Create a new dataslab from an array of rows × columns
+        """
+        self = cls()
+        self.data = data
+        self.row_names = tuple(row_names)
+        self.column_dates = tuple(column_dates)
+        self.missing_names = []
+        return self
     #]
 
 
@@ -16,11 +16,11 @@ from typing import (Self, NoReturn, )
 from collections.abc import (Iterable, )
 
 from .incidence import (Token, Tokens, )
-from . import (incidence as in_, wrongdoings as wd_, )
+from . import (incidence as in_, wrongdoings as wd_, compilers as cm_, )
 #]
 
 
-EVALUATOR_PREAMBLE = "lambda x, t, L: "
+EVALUATOR_PREAMBLE = cm_.EVALUATOR_PREAMBLE
 _EVALUATOR_FORMAT = EVALUATOR_PREAMBLE + "[{joined_xtrings}]"
 X_REF_PATTERN = "{qid},t{shift:+g},{eid}"
 
@@ -164,8 +164,11 @@ def create_name_to_qid_from_equations(equations: Equations) -> dict[str, int]:
 
 def create_evaluator_func_string(xtrings: str) -> str:
     """
+    Create an evaluator lambda string with constants folded and common
+    subexpressions computed only once
     """
-    return _EVALUATOR_FORMAT.format(joined_xtrings=" , ".join(xtrings))
+    func_string = _EVALUATOR_FORMAT.format(joined_xtrings=" , ".join(xtrings))
+    return cm_.optimize_evaluator_string(func_string)
 
 
 def create_eid_to_wrt_tokens(
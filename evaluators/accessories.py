@@ -10,7 +10,7 @@ import scipy as sp_
 from typing import (Self, NoReturn, Callable, )
 from collections.abc import (Iterable, )
 
-from .. import (equations as eq_, quantities as qu_, )
+from .. import (equations as eq_, quantities as qu_, compilers as cm_, )
 from ..aldi import (adaptations as aa_, )
 #]
 
@@ -33,14 +33,21 @@ class EvaluatorMixin:
         self,
         /,
         function_context: dict | None = None,
+        compile_workers: int | None = None,
+        separate_eids: Iterable[int] = (),
     ) -> NoReturn:
         """
+        Compile the equations in cached chunks, the equations with
+        separate_eids in chunks of their own, see compilers.ChunkedEvaluator
         """
         function_context = aa_.add_function_adaptations_to_custom_functions(function_context)
-        function_context["_array"] = np_.array
         self._xtrings = [ eqn.remove_equation_ref_from_xtring() for eqn in self._equations ]
-        func_string = " , ".join(self._xtrings)
-        self._func = eval(eq_.EVALUATOR_PREAMBLE + f"_array([{func_string}], dtype=float)", function_context)
+        separate_eids = set(separate_eids, )
+        func = cm_.ChunkedEvaluator.from_xtrings(
+            self._xtrings, workers=compile_workers,
+            separate=(i for i, eqn in enumerate(self._equations) if eqn.id in separate_eids),
+        ).bind(function_context, )
+        self._func = lambda x, t, L: np_.array(func(x, t, L, ), dtype=float, )
 
     def _populate_min_max_shifts(self) -> NoReturn:
         """
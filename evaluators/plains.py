@@ -26,9 +26,11 @@ class PlainEvaluator(ea_.EvaluatorMixin):
         equations: eq_.Equations,
         function_context: dir | None = None,
         /,
+        compile_workers: int | None = None,
+        separate_eids: Iterable[int] = (),
     ) -> NoReturn:
         self._equations = list(equations, )
-        self._create_evaluator_function(function_context, )
+        self._create_evaluator_function(function_context, compile_workers, separate_eids, )
         self._populate_min_max_shifts()
 
     @property
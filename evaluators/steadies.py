@@ -58,7 +58,7 @@ class SteadyEvaluator(ea_.EvaluatorMixin):
         self._equations = list(equations)
         self._quantities = list(quantities)
         self._eids = list(eq_.generate_all_eids(self._equations))
-        self._create_evaluator_function(function_context)
+        self._create_evaluator_function(function_context, kwargs.get("compile_workers", ), )
         self._create_incidence_matrix()
         self._x = steady_array
         self._z0 = z0.reshape(-1,) if z0 is not None else None
@@ -130,6 +130,25 @@ class SteadyEvaluator(ea_.EvaluatorMixin):
         j_sum_of_squares = np_.sum(j_sum_of_squares, axis=0)
         return sum_of_squares, j_sum_of_squares
 
+    def eval_sum_of_squares_hessp(
+        self,
+        current: np_.ndarray | None,
+        vector: np_.ndarray,
+        /,
+    ) -> np_.ndarray:
+        """
+        Exact Hessian-vector product of the sum of squares objective,
+        2 * (J' J + sum_i f_i H_i) @ vector, in the form expected by the
+        hessp argument of scipy.optimize.minimize
+        """
+        current = current if current is not None else self._z0.reshape(-1, 1, )
+        self._steady_array_updater(self._x, current, )
+        f = self._func(self._x, self._t_zero, None, ).reshape(-1)
+        j = self._jacobian_descriptor.eval(self._x, None, )
+        vector = np_.asarray(vector, dtype=float, ).reshape(-1)
+        curvature = self._jacobian_descriptor.eval_weighted_hessian_vector(self._x, None, f, vector, )
+        return 2 * (j.T @ (j @ vector) + curvature)
+
     def eval_with_jacobian(
         self,
         current: np_.ndarray | None = None,
@@ -0,0 +1,126 @@
+"""
+Code-generated functions filling first-order system matrices
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Self, NoReturn, )
+import numpy as np_
+
+from .. import (equations as eq_, )
+from ..aldi import (maps as am_, symbolics as ay_, )
+#]
+
+
+_SYSTEM_FUNCTION_NAME = "_fill_system"
+_DIFF_MATRIX_NAMES = ("A", "B", "D", "F", "G", "J", )
+_CONSTANT_MATRIX_NAMES = ("C", "H", )
+
+
+class SystemFunction:
+    """
+    Straight-line function writing the derivatives and constants of the
+    system equations directly into the system matrices
+    --------------------------------------------------------------------
+    * source -- generated Python source
+    * qid_to_logly -- log status of quantities assumed in the source
+    * _func -- compiled function
+    """
+    #[
+    __slots__ = ("source", "qid_to_logly", "_func", )
+
+    @classmethod
+    def for_descriptor(
+        cls,
+        descriptor: Descriptor,
+        equations: eq_.Equations,
+        qid_to_logly: dict[int, bool],
+        /,
+    ) -> Self | None:
+        """
+        Differentiate the system equations symbolically and generate the
+        system function; return None if any equation cannot be
+        differentiated symbolically
+        """
+        svec = descriptor.system_vectors
+        smap = descriptor.system_map
+        system_eids = svec.transition_eids + svec.measurement_eids
+        eid_to_equation = { eqn.id: eqn for eqn in equations }
+        eid_to_rhs_offset = am_.create_eid_to_rhs_offset(system_eids, svec.eid_to_wrt_tokens, )
+        #
+        differentiator = ay_.SymbolicDifferentiator(-descriptor.aldi_context.min_shift, qid_to_logly, )
+        td_rows, tc_rows = {}, {}
+        try:
+            for position, eid in enumerate(system_eids):
+                derivative = differentiator.differentiate(
+                    eid_to_equation[eid].remove_equation_ref_from_xtring(),
+                    svec.eid_to_wrt_tokens[eid],
+                )
+                tc_rows[position] = derivative.value
+                offset = eid_to_rhs_offset[eid]
+                td_rows.update((offset + k, d) for k, d in derivative.diffs.items())
+        except ay_.NonsymbolicExpression:
+            return None
+        #
+        lines = list(differentiator.lines)
+        for name in _DIFF_MATRIX_NAMES:
+            lines += _generate_assignments(name, getattr(smap, name), td_rows, )
+        for name in _CONSTANT_MATRIX_NAMES:
+            lines += _generate_assignments(name, getattr(smap, name), tc_rows, )
+        #
+        self = cls()
+        self.qid_to_logly = dict(qid_to_logly)
+        self.source = (
+            f"def {_SYSTEM_FUNCTION_NAME}(x, L, A, B, C, D, F, G, H, J, ):\n"
+            + "".join(f"    {line}\n" for line in lines)
+            + "    pass\n"
+        )
+        namespace = ay_.create_namespace()
+        exec(self.source, namespace, )
+        self._func = namespace[_SYSTEM_FUNCTION_NAME]
+        return self
+
+    def accepts(self, logly_context: dict[int, bool], /, ) -> bool:
+        """
+        True if the log status assumed in the source is the one requested
+        """
+        return logly_context == self.qid_to_logly
+
+    def __call__(
+        self,
+        value_context: np_.ndarray,
+        steady_array: np_.ndarray,
+        system: System,
+        /,
+    ) -> NoReturn:
+        """
+        Fill the (zero-initialized) system matrices excluding the dynamic
+        identity rows
+        """
+        self._func(
+            value_context, steady_array,
+            system.A, system.B, system.C, system.D,
+            system.F, system.G, system.H, system.J,
+        )
+    #]
+
+
+def _generate_assignments(
+    matrix_name: str,
+    array_map: am_.ArrayMap,
+    row_to_source: dict[int, str],
+    /,
+) -> list[str]:
+    """
+    Generate assignments of the nonzero entries mapped into a matrix
+    """
+    #[
+    return [
+        f"{matrix_name}[..., {lhs_row}, {lhs_column}] = {row_to_source[rhs_row]}"
+        for lhs_row, lhs_column, rhs_row in zip(array_map.lhs[0], array_map.lhs[1], array_map.rhs[0], )
+        if rhs_row in row_to_source
+    ]
+    #]
+
@@ -20,15 +20,18 @@ $$
 #[
 from __future__ import annotations
 
-from typing import (Self, NoReturn, )
+from typing import (Self, NoReturn, Any, Callable, NamedTuple, )
 from collections.abc import (Iterable, )
 import itertools as it_
 import dataclasses as dc_
+import threading as th_
 import numpy as np_
+import scipy as sp_
 
 from .. import (incidence as in_, equations as eq_, quantities as qu_, )
 from ..aldi import (differentiators as ad_, )
 from ..aldi import (maps as am_, )
+from . import (codegens as fc_, )
 #]
 
 
@@ -45,7 +48,15 @@ class Descriptor:
     system_vectors: _SystemVectors | None = None
     solution_vectors: _SolutionVectors | None = None
     system_map: SystemMap | None = None
+    stacked_time_map: StackedTimeMap | None = None
     aldi_context: ad_.Context | None = None
+    system_function: fc_.SystemFunction | None = None
+    num_periods: int = 1
+    _aldi_arguments: tuple | None = None
+    _stacked_aldi_contexts: dict[int, ad_.Context] | None = None
+    sparse_system: bool = False
+    workspace: SystemWorkspace | None = None
+    qz_blocks: QZBlocks | None = None
 
     def __init__(
         self,
@@ -53,22 +64,99 @@ class Descriptor:
         quantities: qu_.Quantities,
         custom_functions: dict | None,
         /,
+        separate_eids: Iterable[int] = (),
+        **kwargs,
     ) -> NoReturn:
+        """
+        The equations with separate_eids are compiled apart from the others,
+        see aldi.differentiators.Context.for_equations
+        """
         self.system_vectors = _SystemVectors(equations, quantities)
         self.solution_vectors = _SolutionVectors(self.system_vectors)
         self.system_map = SystemMap(self.system_vectors)
+        self.stacked_time_map = StackedTimeMap(self.system_vectors)
         #
         # Create the context for the algorithmic differentiator
-        system_equations = _select_system_equations_from_equations(
+        system_equations = list(_select_system_equations_from_equations(
             equations,
             self.system_vectors.transition_eids,
             self.system_vectors.measurement_eids,
-        )
+        ))
         #
+        # Assemble the system matrices as scipy sparse matrices, see
+        # System.from_descriptor
+        self.sparse_system = kwargs.get("sparse_system", False)
+        self._aldi_arguments = (
+            system_equations, self.system_vectors.eid_to_wrt_tokens, custom_functions,
+            {
+                "tape": kwargs.get("aldi_tape", False),
+                "finite_diff": kwargs.get("aldi_finite_diff", "central"),
+                "compile_workers": kwargs.get("compile_workers", ),
+                "separate_eids": tuple(separate_eids, ),
+            },
+        )
         num_columns = 1
-        self.aldi_context = ad_.Context.for_equations(
-            AtomFactory, system_equations,
-            self.system_vectors.eid_to_wrt_tokens, num_columns, custom_functions,
+        self.aldi_context = self._create_aldi_context(num_columns, )
+        #
+        # Default number of consecutive periods evaluated at once by
+        # eval_stacked_jacobian; the contexts with num_periods columns are
+        # created on first use
+        self.num_periods = kwargs.get("num_periods", 1)
+        self._stacked_aldi_contexts = {}
+        #
+        # Preallocated buffers for repeated creation of single systems, see
+        # System.from_descriptor
+        self.workspace = SystemWorkspace()
+        #
+        # Block-triangular ordering of the transition equations for the QZ
+        # decomposition with block_qz=True, see fords.solutions._solve_ordqz
+        self.qz_blocks = (
+            QZBlocks.for_system(self.system_vectors, self.system_map, )
+            if kwargs.get("block_qz", False) else None
+        )
+
+    def eval_stacked_jacobian(
+        self,
+        data_context: np_.ndarray,
+        logly_context: dict[int, bool],
+        steady_array: np_.ndarray,
+        /,
+        num_periods: int | None = None,
+    ) -> sp_.sparse.csr_matrix:
+        """
+        Evaluate the Jacobian of the system equations in num_periods
+        periods (the num_periods of the descriptor by default) in one call,
+        and lay out the per-period blocks in a stacked-time sparse matrix,
+        see StackedTimeMap; data_context needs the columns of
+        get_stacked_aldi_context(num_periods)
+        """
+        num_periods = num_periods or self.num_periods
+        aldi_context = self.get_stacked_aldi_context(num_periods, )
+        diff_array = aldi_context.eval_diff_to_array(data_context, logly_context, steady_array, )
+        return self.stacked_time_map.create_stacked_jacobian(diff_array, num_periods, )
+
+    def get_stacked_aldi_context(
+        self,
+        num_periods: int | None = None,
+        /,
+    ) -> ad_.Context:
+        """
+        Get the aldi context evaluating the system equations in num_periods
+        consecutive periods (one column each), creating it on first use;
+        the aldi_context of the descriptor itself evaluates one period
+        """
+        num_periods = num_periods or self.num_periods
+        if num_periods == 1:
+            return self.aldi_context
+        if num_periods not in self._stacked_aldi_contexts:
+            self._stacked_aldi_contexts[num_periods] = self._create_aldi_context(num_periods, )
+        return self._stacked_aldi_contexts[num_periods]
+
+    def _create_aldi_context(self, num_columns: int, /, ) -> ad_.Context:
+        equations, eid_to_wrt_tokens, custom_functions, aldi_kwargs = self._aldi_arguments
+        return ad_.Context.for_equations(
+            AtomFactory, equations, eid_to_wrt_tokens, num_columns, custom_functions,
+            **aldi_kwargs,
         )
 
     def get_num_backwards(self: Self) -> int:
@@ -79,6 +167,183 @@ class Descriptor:
     #]
 
 
+class SystemWorkspace:
+    """
+    Preallocated buffers reused by repeated creation of first-order systems
+    -----------------------------------------------------------------------
+    * _local -- per-thread buffers: value contexts keyed by their shape, and
+    the full-size system matrices, with the dynamic identity rows filled in
+    once, together with their views excluding the dynamic identity rows;
+    the logly masks and shift vectors used to fill the value contexts
+
+    The buffers are overwritten by the next system created in the same
+    thread, so a system created in a workspace has to be used up before
+    then; copies and pickles of a workspace start empty
+    """
+    #[
+    __slots__ = ("_local", )
+
+    def __init__(self, /, ) -> NoReturn:
+        self._local = th_.local()
+
+    def __reduce__(self, /, ) -> tuple:
+        return (type(self), (), )
+
+    def get_value_context(self, shape: tuple[int, int], /, ) -> np_.ndarray:
+        """
+        Return the value context buffer of a given shape
+        """
+        value_contexts = self._get_buffer("value_contexts", dict, )
+        if shape not in value_contexts:
+            value_contexts[shape] = np_.empty(shape, dtype=float, )
+        return value_contexts[shape]
+
+    def get_logly_masks(
+        self,
+        qid_to_logly: dict[int, bool | None],
+        num_quantities: int,
+        /,
+    ) -> tuple[np_.ndarray, np_.ndarray]:
+        """
+        Return the logly masks of the quantities, see
+        quantities.create_logly_masks; recreated only when the log-status
+        of the quantities has changed
+        """
+        cached = getattr(self._local, "logly_masks", None, )
+        if cached is None or cached[0] != qid_to_logly or cached[1][0].shape[0] != num_quantities:
+            cached = (dict(qid_to_logly), qu_.create_logly_masks(qid_to_logly, num_quantities, ), )
+            self._local.logly_masks = cached
+        return cached[1]
+
+    def get_shift_vec(
+        self,
+        shift_in_first_column: int,
+        num_columns: int,
+        /,
+    ) -> np_.ndarray:
+        """
+        Return the vector of shifts of num_columns consecutive columns
+        """
+        shift_vecs = self._get_buffer("shift_vecs", dict, )
+        key = (shift_in_first_column, num_columns, )
+        if key not in shift_vecs:
+            shift_vecs[key] = np_.arange(shift_in_first_column, shift_in_first_column+num_columns, )
+        return shift_vecs[key]
+
+    def get_system_matrices(
+        self,
+        system_vectors: _SystemVectors,
+        system_map: SystemMap,
+        /,
+    ) -> dict[str, tuple[np_.ndarray, np_.ndarray]]:
+        """
+        Return the full-size system matrices and their views excluding the
+        dynamic identity rows, keyed by the matrix names
+        """
+        return self._get_buffer(
+            "system_matrices",
+            lambda: _create_system_matrices(system_vectors, system_map, ),
+        )
+
+    def _get_buffer(self, name: str, create: Callable, /, ) -> Any:
+        buffer = getattr(self._local, name, None, )
+        if buffer is None:
+            buffer = create()
+            setattr(self._local, name, buffer, )
+        return buffer
+    #]
+
+
+"""
+Default minimum size of the diagonal blocks of the QZ decomposition; smaller
+neighbouring blocks are merged
+"""
+DEFAULT_MIN_QZ_BLOCK_SIZE = 10
+
+
+class QZBlocks(NamedTuple):
+    """
+    Block upper triangular ordering of the transition pencil (A, B)
+    ---------------------------------------------------------------
+    * row_order -- order of the rows of A and B
+    * column_order -- order of the columns of A and B
+    * boundaries -- start of each diagonal block, and the end of the last
+
+    A[row_order, :][:, column_order] and the same for B are block upper
+    triangular for any values at the structural nonzeros
+    """
+    #[
+    row_order: np_.ndarray
+    column_order: np_.ndarray
+    boundaries: tuple[int, ...]
+
+    @classmethod
+    def for_system(
+        cls,
+        system_vectors: _SystemVectors,
+        system_map: SystemMap,
+        /,
+        min_block_size: int = DEFAULT_MIN_QZ_BLOCK_SIZE,
+    ) -> Self | None:
+        """
+        Find the ordering from the incidence of the transition variables in
+        the transition equations and the dynamic identities: match the rows
+        to the columns, order the strongly connected components of the
+        matched incidence graph topologically, and merge neighbouring
+        blocks smaller than min_block_size; return None if there is only
+        one block or the incidence is structurally singular
+        """
+        num_excl_dynid = system_vectors.shape_AB_excl_dynid[0]
+        num_rows = len(system_vectors.transition_variables)
+        rows, columns = zip(*(
+            (lhs[0] + offset, lhs[1], )
+            for lhs, offset in (
+                (system_map.A.lhs, 0, ),
+                (system_map.B.lhs, 0, ),
+                (system_map.sparse_dynid_A.nonzero(), num_excl_dynid, ),
+                (system_map.sparse_dynid_B.nonzero(), num_excl_dynid, ),
+            )
+        ))
+        rows, columns = np_.concatenate(rows, ), np_.concatenate(columns, )
+        incidence = sp_.sparse.csr_matrix(
+            (np_.ones(rows.size, dtype=bool, ), (rows, columns, ), ),
+            shape=(num_rows, num_rows, ),
+        )
+        #
+        # Column matched with each row, so that the matched incidence has a
+        # zero-free diagonal
+        matching = sp_.sparse.csgraph.maximum_bipartite_matching(incidence, perm_type="column", )
+        if np_.any(matching < 0):
+            return None
+        matched = incidence[:, matching]
+        num_components, labels = sp_.sparse.csgraph.connected_components(matched, directed=True, connection="strong", )
+        if num_components <= 1:
+            return None
+        #
+        # Order the components so that the equations in each depend only on
+        # the variables in the same or later components
+        sources, targets = matched.nonzero()
+        edges = set(zip(labels[sources].tolist(), labels[targets].tolist(), ))
+        component_order = _sort_topologically(num_components, [ e for e in edges if e[0] != e[1] ], )
+        component_position = np_.empty(num_components, dtype=int, )
+        component_position[component_order] = np_.arange(num_components, )
+        row_order = np_.argsort(component_position[labels], kind="stable", )
+        sizes = np_.bincount(component_position[labels], minlength=num_components, )
+        #
+        boundaries = [0]
+        for size in sizes:
+            if len(boundaries) > 1 and boundaries[-1] - boundaries[-2] < min_block_size:
+                boundaries[-1] += int(size)
+            else:
+                boundaries.append(boundaries[-1] + int(size))
+        if len(boundaries) > 2 and boundaries[-1] - boundaries[-2] < min_block_size:
+            del boundaries[-2]
+        if len(boundaries) <= 2:
+            return None
+        return cls(row_order, matching[row_order], tuple(boundaries), )
+    #]
+
+
 #••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
 # Backend
 #••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
@@ -267,6 +532,8 @@ class SystemMap:
     dynid_B: np_.ndarray | None = None
     dynid_C: np_.ndarray | None = None
     dynid_D: np_.ndarray | None = None
+    sparse_dynid_A: sp_.sparse.csr_matrix | None = None
+    sparse_dynid_B: sp_.sparse.csr_matrix | None = None
     #
     F: am_.ArrayMap | None = None
     G: am_.ArrayMap | None = None
@@ -329,7 +596,8 @@ class SystemMap:
         )
         #
         num_dynid_rows = len(system_vectors.transition_variables) - len(system_vectors.transition_eids)
-        self.dynid_A, self.dynid_B = _create_dynid_matrices(system_vectors.transition_variables, )
+        self.sparse_dynid_A, self.sparse_dynid_B = _create_dynid_matrices(system_vectors.transition_variables, )
+        self.dynid_A, self.dynid_B = self.sparse_dynid_A.toarray(), self.sparse_dynid_B.toarray()
         self.dynid_C = np_.zeros((num_dynid_rows, system_vectors.shape_C_excl_dynid[1]), dtype=float, )
         self.dynid_D = np_.zeros((num_dynid_rows, system_vectors.shape_D_excl_dynid[1]), dtype=float, )
         #
@@ -371,7 +639,7 @@ class SystemMap:
 
 def _create_dynid_matrices(system_transition_vector: in_.Tokens):
     """
-    Create dynamic identity matrix for unsolved system
+    Create dynamic identity matrix for unsolved system as sparse matrices
     """
     #[
     max_shifts = in_.get_some_shift_by_quantities(system_transition_vector, max)
@@ -389,15 +657,88 @@ def _create_dynid_matrices(system_transition_vector: in_.Tokens):
         index_B[1].append(j)
         row_count += 1
     #
-    num_columns = len(system_transition_vector)
-    dynid_A = np_.zeros((row_count, num_columns), dtype=float)
-    dynid_B = np_.zeros((row_count, num_columns), dtype=float)
-    dynid_A[index_A] = 1
-    dynid_B[index_B] = -1
+    shape = (row_count, len(system_transition_vector), )
+    dynid_A = sp_.sparse.csr_matrix((np_.ones(row_count, ), index_A, ), shape=shape, dtype=float, )
+    dynid_B = sp_.sparse.csr_matrix((-np_.ones(row_count, ), index_B, ), shape=shape, dtype=float, )
     return dynid_A, dynid_B
     #]
 
 
+@dc_.dataclass
+class StackedTimeMap:
+    """
+    Map from the rows of the aldi diff array to the stacked-time Jacobian
+    ----------------------------------------------------------------------
+    * qids -- quantities along the columns within each period block
+    * num_equations -- number of system equations (rows in each period block)
+    * rhs_rows -- rows in the diff array
+    * lhs_rows -- equation positions within a period block
+    * lhs_columns -- quantity positions within a period block
+    * shifts -- time shifts of the tokens, i.e. the block column offsets
+
+    In period t, the derivative of equation i w.r.t. token (q, s) lands in
+    row t*num_equations + i and column (t+s)*len(qids) + q; tokens dated
+    outside the range of periods are dropped (they are fixed data).
+    """
+    #[
+    qids: list[int] | None = None
+    num_equations: int | None = None
+    rhs_rows: np_.ndarray | None = None
+    lhs_rows: np_.ndarray | None = None
+    lhs_columns: np_.ndarray | None = None
+    shifts: np_.ndarray | None = None
+
+    def __init__(
+        self,
+        system_vectors: _SystemVectors,
+        /,
+    ) -> NoReturn:
+        """
+        """
+        system_eids = system_vectors.transition_eids + system_vectors.measurement_eids
+        eid_to_wrt_tokens = system_vectors.eid_to_wrt_tokens
+        self.qids = sorted(set(
+            t.qid for eid in system_eids for t in eid_to_wrt_tokens[eid]
+        ))
+        qid_to_column = { qid: i for i, qid in enumerate(self.qids) }
+        self.num_equations = len(system_eids)
+        lhs_rows, lhs_columns, shifts = [], [], []
+        for row, eid in enumerate(system_eids):
+            for t in eid_to_wrt_tokens[eid]:
+                lhs_rows.append(row)
+                lhs_columns.append(qid_to_column[t.qid])
+                shifts.append(t.shift)
+        # The wrt tokens of the system equations follow one another in the
+        # diff array
+        self.rhs_rows = np_.arange(len(lhs_rows), dtype=int, )
+        self.lhs_rows = np_.array(lhs_rows, dtype=int, )
+        self.lhs_columns = np_.array(lhs_columns, dtype=int, )
+        self.shifts = np_.array(shifts, dtype=int, )
+
+    def create_stacked_jacobian(
+        self,
+        diff_array: np_.ndarray,
+        num_periods: int,
+        /,
+    ) -> sp_.sparse.csr_matrix:
+        """
+        Create the stacked-time Jacobian from a diff array with one column
+        per period
+        """
+        num_qids = len(self.qids)
+        periods = np_.arange(num_periods, dtype=int, ).reshape(-1, 1)
+        rows = periods*self.num_equations + self.lhs_rows
+        columns = (periods + self.shifts)*num_qids + self.lhs_columns
+        values = np_.broadcast_to(diff_array[self.rhs_rows, :].T, rows.shape, )
+        inx_within = (periods + self.shifts >= 0) & (periods + self.shifts < num_periods)
+        return sp_.sparse.coo_matrix(
+            (values[inx_within], (rows[inx_within], columns[inx_within], ), ),
+            (num_periods*self.num_equations, num_periods*num_qids, ),
+            dtype=float,
+        ).tocsr()
+    #]
+
+
 def _adjust_for_measurement_equations(
     tokens_transition_variables: qu_.Quantities,
     equations: eq_.Equations,
@@ -435,7 +776,7 @@ class AtomFactory:
     def create_diff_from_token(
         token: Token,
         wrt_tokens: Tokens,
-    ) -> np_.ndarray:
+    ) -> np_.ndarray | int:
         """
         """
         if token in wrt_tokens:
@@ -467,3 +808,58 @@ class AtomFactory:
     #]
 
 
+def _create_system_matrices(
+    system_vectors: _SystemVectors,
+    system_map: SystemMap,
+    /,
+) -> dict[str, tuple[np_.ndarray, np_.ndarray]]:
+    """
+    Allocate the full-size system matrices with the dynamic identity rows
+    filled in, and their views excluding the dynamic identity rows
+    """
+    #[
+    shapes_excl_dynid = {
+        "A": system_vectors.shape_AB_excl_dynid,
+        "B": system_vectors.shape_AB_excl_dynid,
+        "C": system_vectors.shape_C_excl_dynid,
+        "D": system_vectors.shape_D_excl_dynid,
+    }
+    matrices = {}
+    for n, (num_rows, num_columns) in shapes_excl_dynid.items():
+        dynid = getattr(system_map, "dynid_" + n, )
+        full = np_.zeros((num_rows + dynid.shape[0], num_columns), dtype=float, )
+        full[num_rows:, :] = dynid
+        matrices[n] = (full, full[:num_rows, :])
+    for n in ("F", "G", "H", "J", ):
+        full = np_.zeros(getattr(system_vectors, "shape_" + n, ), dtype=float, )
+        matrices[n] = (full, full)
+    return matrices
+    #]
+
+
+def _sort_topologically(
+    num_nodes: int,
+    edges: Iterable[tuple[int, int]],
+    /,
+) -> list[int]:
+    """
+    Sort the nodes of a directed acyclic graph so that each edge points
+    forward
+    """
+    #[
+    successors = [ [] for _ in range(num_nodes) ]
+    num_predecessors = [0] * num_nodes
+    for source, target in edges:
+        successors[source].append(target)
+        num_predecessors[target] += 1
+    stack = [ n for n in range(num_nodes) if not num_predecessors[n] ]
+    order = []
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        for target in successors[node]:
+            num_predecessors[target] -= 1
+            if not num_predecessors[target]:
+                stack.append(target)
+    return order
+    #]
@@ -0,0 +1,225 @@
+"""
+Kalman filter for first-order solutions
+
+$$
+x_{t} = T x_{t-1} + K + R v_{t} \\
+y_{t} = Z x_{t} + D + H w_{t}
+$$
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Self, NoReturn, )
+import dataclasses as dc_
+import numpy as np_
+import scipy as sp_
+
+from ..fords import (solutions as sl_, )
+#]
+
+
+"""
+Variance of the initial states along unit or explosive roots
+"""
+DEFAULT_DIFFUSE_SCALE = 1e6
+
+
+@dc_.dataclass
+class FilterOutput:
+    """
+    Output of the Kalman filter
+    ---------------------------
+    * predicted -- means of the states predicted from t-1, states × periods
+    * filtered -- means of the states updated with the observations in t
+    * prediction_errors -- observations minus their predictions, NaN where
+    not observed
+    * log_likelihood -- log-likelihood of the observations
+    * steady_period -- period from which the steady-state gain was last
+    used, or None if the covariance has not converged
+    """
+    #[
+    predicted: np_.ndarray | None = None
+    filtered: np_.ndarray | None = None
+    prediction_errors: np_.ndarray | None = None
+    log_likelihood: float = 0
+    steady_period: int | None = None
+    #]
+
+
+def filter_flat(
+    solution: sl_.Solution,
+    observations: np_.ndarray,
+    transition_stds: np_.ndarray,
+    measurement_stds: np_.ndarray,
+    deviation: bool,
+    /,
+    tolerance: float = 1e-10,
+    diffuse_scale: float = DEFAULT_DIFFUSE_SCALE,
+) -> FilterOutput:
+    """
+    Run the Kalman filter over observations, measurement variables ×
+    periods, with NaN for missing observations; the filter starts from the
+    unconditional distribution of the states, see create_initial_state.
+    Once the predicted covariance changes by less than tolerance between
+    two fully observed periods, the steady-state gain is used and the
+    Riccati update skipped until a period with missing observations
+    """
+    #[
+    T, R, Z, H = solution.T, solution.R, solution.Z, solution.H
+    K = solution.K.reshape(-1) if not deviation else np_.zeros(T.shape[0], )
+    D = solution.D.reshape(-1) if not deviation else np_.zeros(Z.shape[0], )
+    Q = _create_covariance(R, transition_stds, )
+    G = _create_covariance(H, measurement_stds, )
+    num_periods = observations.shape[1]
+    #
+    output = FilterOutput(
+        predicted=np_.zeros((T.shape[0], num_periods, ), dtype=float, ),
+        filtered=np_.zeros((T.shape[0], num_periods, ), dtype=float, ),
+        prediction_errors=np_.full(observations.shape, np_.nan, dtype=float, ),
+    )
+    a, P = create_initial_state(T, K, Q, diffuse_scale=diffuse_scale, )
+    steady = None
+    prev_P_pred = None
+    for t in range(num_periods):
+        observed = ~np_.isnan(observations[:, t])
+        is_fully_observed = observed.all()
+        #
+        # Prediction step
+        a = T @ a + K
+        output.predicted[:, t] = a
+        if not observed.any():
+            steady, prev_P_pred = None, None
+            P = T @ P @ T.T + Q
+            output.filtered[:, t] = a
+            continue
+        if steady is not None and is_fully_observed:
+            # Steady-state gain: no Riccati update
+            gain, F_factor, log_det_F = steady
+            v = observations[:, t] - Z @ a - D
+        else:
+            steady = None
+            P = T @ P @ T.T + Q
+            Z_o = Z[observed, :]
+            v = observations[observed, t] - Z_o @ a - D[observed]
+            F = Z_o @ P @ Z_o.T + G[np_.ix_(observed, observed)]
+            F_factor = sp_.linalg.cho_factor(F, )
+            log_det_F = 2 * np_.sum(np_.log(np_.diag(F_factor[0])))
+            gain = sp_.linalg.cho_solve(F_factor, Z_o @ P, ).T
+            if is_fully_observed and prev_P_pred is not None and np_.max(np_.abs(P - prev_P_pred)) < tolerance:
+                steady = (gain, F_factor, log_det_F, )
+                output.steady_period = t
+            prev_P_pred = P if is_fully_observed else None
+            P = P - gain @ Z_o @ P
+        #
+        # Update step
+        a = a + gain @ v
+        output.filtered[:, t] = a
+        output.prediction_errors[observed, t] = v
+        output.log_likelihood -= 0.5 * (
+            v.size * np_.log(2 * np_.pi) + log_det_F + v @ sp_.linalg.cho_solve(F_factor, v, )
+        )
+    return output
+    #]
+
+
+def evaluate_log_likelihood(
+    solution: sl_.Solution,
+    observations: np_.ndarray,
+    transition_stds: np_.ndarray,
+    measurement_stds: np_.ndarray,
+    deviation: bool,
+    /,
+    return_prediction_errors: bool = False,
+) -> float | tuple[float, np_.ndarray]:
+    """
+    Evaluate the log-likelihood of observations, measurement variables ×
+    periods, using the Chandrasekhar recursions; the states start from
+    their unconditional distribution, so T must be stable, and the
+    observations must have no missing values, see filter_flat otherwise
+
+    The recursions update the low-rank increments of the predicted
+    covariance, P(t+1) - P(t) = W(t) M(t) W(t)', with W states ×
+    measurement variables, instead of the covariance itself
+    """
+    #[
+    T, R, Z, H = solution.T, solution.R, solution.Z, solution.H
+    K = solution.K.reshape(-1) if not deviation else np_.zeros(T.shape[0], )
+    D = solution.D.reshape(-1) if not deviation else np_.zeros(Z.shape[0], )
+    if np_.isnan(observations).any():
+        raise ValueError("Chandrasekhar recursions need observations with no missing values")
+    if np_.max(np_.abs(np_.linalg.eigvals(T, )), initial=0, ) >= 1:
+        raise ValueError("Chandrasekhar recursions need a stable transition matrix")
+    Q = _create_covariance(R, transition_stds, )
+    G = _create_covariance(H, measurement_stds, )
+    num_observables, num_periods = observations.shape
+    #
+    a, P = create_initial_state(T, K, Q, )
+    # P is a fixed point of the Riccati prediction, P = T P T' + Q
+    ZP = Z @ P
+    F = ZP @ Z.T + G
+    gain = T @ ZP.T
+    F_factor = sp_.linalg.cho_factor(F, check_finite=False, )
+    W = gain
+    M = -sp_.linalg.cho_solve(F_factor, np_.eye(num_observables, ), check_finite=False, )
+    #
+    prediction_errors = np_.zeros(observations.shape, dtype=float, ) if return_prediction_errors else None
+    log_likelihood = -0.5 * num_periods * num_observables * np_.log(2 * np_.pi)
+    a = T @ a + K
+    for t in range(num_periods):
+        v = observations[:, t] - Z @ a - D
+        if prediction_errors is not None:
+            prediction_errors[:, t] = v
+        F_inv_v = sp_.linalg.cho_solve(F_factor, v, check_finite=False, )
+        log_likelihood -= 0.5 * (2 * np_.sum(np_.log(np_.diag(F_factor[0]))) + v @ F_inv_v)
+        a = T @ a + gain @ F_inv_v + K
+        #
+        # Low-rank update of F, the gain, W and M
+        ZW = Z @ W
+        ZWM = ZW @ M
+        M = M + ZWM.T @ sp_.linalg.cho_solve(F_factor, ZWM, check_finite=False, )
+        F = F + ZWM @ ZW.T
+        gain = gain + T @ (W @ ZWM.T)
+        F_factor = sp_.linalg.cho_factor(F, check_finite=False, )
+        W = T @ W - gain @ sp_.linalg.cho_solve(F_factor, ZW, check_finite=False, )
+    return (log_likelihood, prediction_errors) if return_prediction_errors else log_likelihood
+    #]
+
+
+def create_initial_state(
+    T: np_.ndarray,
+    K: np_.ndarray,
+    Q: np_.ndarray,
+    /,
+    diffuse_scale: float = DEFAULT_DIFFUSE_SCALE,
+) -> tuple[np_.ndarray, np_.ndarray]:
+    """
+    Create the unconditional mean and covariance of the states; the
+    covariance is the solution of the discrete Lyapunov equation
+    P = T P T' + Q for stable T, and diffuse_scale times the identity
+    otherwise
+    """
+    #[
+    num_states = T.shape[0]
+    mean = np_.linalg.lstsq(np_.eye(num_states, ) - T, K, rcond=None, )[0]
+    if np_.max(np_.abs(np_.linalg.eigvals(T, )), initial=0, ) < 1:
+        covariance = sp_.linalg.solve_discrete_lyapunov(T, Q, )
+    else:
+        covariance = diffuse_scale * np_.eye(num_states, )
+    return mean, covariance
+    #]
+
+
+def _create_covariance(
+    impact: np_.ndarray,
+    stds: np_.ndarray,
+    /,
+) -> np_.ndarray:
+    """
+    Covariance matrix impact @ diag(stds**2) @ impact'
+    """
+    #[
+    scaled = impact * np_.asarray(stds, dtype=float, ).reshape(1, -1)
+    return scaled @ scaled.T
+    #]
@@ -69,26 +69,22 @@ def simulate_flat(
     transition_shocks[np_.isnan(transition_shocks)] = 0
     measurement_shocks[np_.isnan(measurement_shocks)] = 0
 
-    Rx = [R]
-    forward = -1
+    # Impact of the transition shocks on the state in each column to run,
+    # precomputed for the whole horizon
+    shock_impacts = np_.zeros((T.shape[0], len(columns_to_run)), dtype=float, )
 
     shock_column_incidence = list(np_.any(transition_shocks[:, column_array] != 0, axis=0))
     if any(shock_column_incidence):
         # Last shock at t+forward
         forward = len(shock_column_incidence) - shock_column_incidence[::-1].index(True) - 1
-        if anticipate:
-            Rk = solution.expand_square_solution(forward)
-        else:
-            Rk = [None]*forward
-        Rx = Rx + (Rk if Rk is not None else [])
-
-    shock_column_end = column_start + forward
-    for t in column_array:
-        shock_impact = sum( 
-            Rx[k] @ transition_shocks[:, (s,)] if Rx[k] is not None else 0 
-            for k, s in enumerate(range(t, shock_column_end+1))
+        Rk = solution.expand_square_solution(forward) if anticipate else None
+        Rx = [R] + (Rk if Rk is not None else [])
+        shock_impacts[:, :forward+1] = _calculate_shock_impacts(
+            Rx, transition_shocks[:, column_start:column_start+forward+1],
         )
-        curr_state = T @ curr_state + shock_impact + K
+
+    for i, t in enumerate(column_array):
+        curr_state = T @ curr_state + shock_impacts[:, (i,)] + K
         data[no_shift_state_to_slab_lhs, t] = curr_state[no_shift_state_to_slab_rhs].flat
 
         y = Z @ curr_state + H @ measurement_shocks[:, (t,)] + D
@@ -99,3 +95,105 @@ def simulate_flat(
 
     return data
 
+
+def simulate_batch(
+    solution: sl_.Solution,
+    solution_vectors: de_.SolutionVectors,
+    data: np_.ndarray,
+    columns_to_run: list[int],
+    deviation: bool,
+    anticipate: bool,
+    /,
+) -> np_.ndarray:
+    """
+    Simulate a batch of scenarios in one pass; data is a 3-D tensor of
+    quantities × columns × scenarios, and the state in each column is a
+    states × scenarios matrix
+    """
+    #[
+    column_start = columns_to_run[0]
+    num_columns = len(columns_to_run)
+    column_array = np_.array(range(column_start, column_start+num_columns))
+
+    vec = solution_vectors
+
+    T = solution.T
+    R = solution.R
+    K = solution.K if not deviation else 0
+
+    Z = solution.Z
+    H = solution.H
+    D = solution.D if not deviation else 0
+
+    curr_state = data[
+        [t.qid for t in vec.transition_variables],
+        [column_start-1+t.shift for t in vec.transition_variables],
+        :,
+    ]
+
+    missing_initials = np_.isnan(curr_state)
+    unnecessary_initials = ~np_.array(vec.initial_conditions).reshape(-1, 1)
+    curr_state[missing_initials & unnecessary_initials] = 0
+
+    no_shift_state_to_slab_lhs = [ t.qid for t in vec.transition_variables if t.shift == 0 ]
+    no_shift_state_to_slab_rhs = [ j for j, t in enumerate(vec.transition_variables) if t.shift == 0 ]
+
+    measurement_variables_to_slab = [t.qid for t in vec.measurement_variables]
+
+    transition_shocks_in_slab = [t.qid for t in vec.transition_shocks]
+    transition_shocks = data[transition_shocks_in_slab, :, :]
+
+    measurement_shocks_in_slab = [t.qid for t in vec.measurement_shocks]
+    measurement_shocks = data[measurement_shocks_in_slab, :, :]
+
+    transition_shocks[np_.isnan(transition_shocks)] = 0
+    measurement_shocks[np_.isnan(measurement_shocks)] = 0
+
+    # Impact of the transition shocks on the state in each column to run,
+    # columns × states × scenarios, accumulated over the horizon k by one
+    # batched product of Rx[k] with the shocks in columns t+k each
+    shock_impacts = np_.zeros((num_columns, T.shape[0], data.shape[2]), dtype=float, )
+
+    shock_column_incidence = list(np_.any(transition_shocks[:, column_array, :] != 0, axis=(0, 2), ))
+    if any(shock_column_incidence):
+        # Last shock at t+forward in any scenario
+        forward = len(shock_column_incidence) - shock_column_incidence[::-1].index(True) - 1
+        Rk = solution.expand_square_solution(forward) if anticipate else None
+        Rx = [R] + (Rk if Rk is not None else [])
+        shocks = transition_shocks[:, column_start:column_start+forward+1, :].transpose(1, 0, 2, )
+        for k, Rx_k in enumerate(Rx):
+            shock_impacts[:forward+1-k] += Rx_k @ shocks[k:]
+
+    for i, t in enumerate(column_array):
+        curr_state = T @ curr_state + shock_impacts[i] + K
+        data[no_shift_state_to_slab_lhs, t, :] = curr_state[no_shift_state_to_slab_rhs, :]
+
+        y = Z @ curr_state + H @ measurement_shocks[:, t, :] + D
+        data[measurement_variables_to_slab, t, :] = y
+
+    data[transition_shocks_in_slab, :, :] = transition_shocks
+    data[measurement_shocks_in_slab, :, :] = measurement_shocks
+
+    return data
+    #]
+
+
+def _calculate_shock_impacts(
+    Rx: list[np_.ndarray],
+    shocks: np_.ndarray,
+    /,
+) -> np_.ndarray:
+    """
+    Calculate the impact of shocks in columns t, t+1, ... on the state in
+    each column t, sum_k Rx[k] @ shocks[:, t+k], as one block matrix product
+    of [Rx[0], Rx[1], ...] and the stacked windows of shocks
+    """
+    #[
+    num_shocks, num_columns = shocks.shape
+    num_windows = len(Rx)
+    padded_shocks = np_.pad(shocks, ((0, 0), (0, num_windows-1), ), )
+    # windows[e, t, k] = shocks[e, t+k]
+    windows = np_.lib.stride_tricks.sliding_window_view(padded_shocks, num_windows, axis=1, )
+    stacked_shocks = windows.transpose(2, 0, 1, ).reshape(num_windows*num_shocks, num_columns, )
+    return np_.hstack(Rx, ) @ stacked_shocks
+    #]
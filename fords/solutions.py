@@ -9,7 +9,7 @@ from __future__ import annotations
 import enum as en_
 import numpy as np_
 import scipy as sp_
-from typing import (Self, NoReturn, Callable, )
+from typing import (Self, NoReturn, Callable, NamedTuple, )
 from numbers import (Number, )
 
 from ..fords import (systems as sy_, descriptors as de_, )
@@ -29,6 +29,27 @@ class SystemStabilityKind(en_.Flag):
     NO_STABLE = en_.auto()
 
 
+class SolutionDimensions(NamedTuple):
+    """
+    Picklable stand-in for a Descriptor holding the dimensions needed to
+    solve a first-order system, so that systems can be solved in worker
+    processes
+    """
+    num_backwards: int
+    num_forwards: int
+    qz_blocks: de_.QZBlocks | None = None
+
+    @classmethod
+    def for_descriptor(cls, descriptor: de_.Descriptor, /, ) -> Self:
+        return cls(descriptor.get_num_backwards(), descriptor.get_num_forwards(), descriptor.qz_blocks, )
+
+    def get_num_backwards(self, /, ) -> int:
+        return self.num_backwards
+
+    def get_num_forwards(self, /, ) -> int:
+        return self.num_forwards
+
+
 class Solution:
     """
     ## Square solution:
@@ -50,12 +71,15 @@ class Solution:
     Ru: Forward-looking impact matrix of transition shocks
     X: Impact matrix in square system
     Xa: Impact matrix in triangular system
+    _expansion: R matrices for t+1...t+k expanded so far
+    _expansion_power: J**k for the next step of the expansion
     """
     __slots__ = (
         "Ua", "Ta", "Ra", "Ka", "Xa", "J", "Ru",
         "T", "R", "K", "X",
         "Za", "Z", "H", "D",
         "eigen_values", "eigen_values_stability", "system_stability",
+        "_expansion", "_expansion_power",
     )
     @classmethod
     def for_model(
@@ -67,12 +91,14 @@ class Solution:
         tolerance: float = 1e-12,
     ) -> Self:
         self = cls()
+        # The QZ decomposition works on dense matrices
+        system = system.to_dense()
         is_alpha_beta_stable_or_unit_root = lambda alpha, beta: abs(beta) < (1 + tolerance)*abs(alpha)
         is_stable_root = lambda root: abs(root) < (1 - tolerance)
         is_unit_root = lambda root: abs(root) >= (1 - tolerance) and abs(root) < (1 + tolerance)
         #
         # Detach unstable from (stable + unit) roots and solve out expectations
-        qz, eigen_values, eigen_values_stability = _solve_ordqz(system, is_alpha_beta_stable_or_unit_root, is_stable_root, is_unit_root, )
+        qz, eigen_values, eigen_values_stability = _solve_ordqz(system, is_alpha_beta_stable_or_unit_root, is_stable_root, is_unit_root, descriptor.qz_blocks, )
         system_stability = _classify_system_stability(descriptor, eigen_values_stability, )
         triangular_solution_prelim = _solve_transition_equations(descriptor, system, qz, )
         #
@@ -89,27 +115,58 @@ class Solution:
         #
         return self
 
+    def copy_without_expansion(self, /, ) -> Self:
+        """
+        Create a shallow copy sharing the solution matrices but not the
+        forward expansion, see expand_square_solution
+        """
+        new = type(self)()
+        for n in self.__slots__:
+            if not n.startswith("_expansion") and hasattr(self, n, ):
+                setattr(new, n, getattr(self, n, ), )
+        return new
+
     def expand_square_solution(self, forward, /, ) -> list[np_.ndarray]:
         """
-        Expand R matrices of square solution for t+1...t+forward
+        Expand R matrices of square solution for t+1...t+forward; the
+        expansion is stored on the solution and only extended when a longer
+        horizon than ever before is requested
         """
         R, X, J, Ru = self.R, self.X, self.J, self.Ru
         if (R is None) or (X is None) or (J is None) or (Ru is None):
             return None
-        Jk = np_.eye(J.shape[0])
-        #
-        # return [R(t+1), R(t+2), ..., R(t+forward)]
-        #
-        # R(t+k) = -X J**(k-1) Ru e(t+k)
-        # k = 1, ..., forward or k-1 = 0, ..., forward-1
-        #
-        return [
-            -X @ np_.linalg.matrix_power(J, k_minus_1) @ Ru 
-            for k_minus_1 in range(0, forward)
-        ]
+        expansion = getattr(self, "_expansion", None, ) or []
+        if forward > len(expansion):
+            Jk = getattr(self, "_expansion_power", None, ) if expansion else np_.eye(J.shape[0])
+            #
+            # return [R(t+1), R(t+2), ..., R(t+forward)]
+            #
+            # R(t+k) = -X J**(k-1) Ru e(t+k), J**(k-1) = J J**(k-2)
+            # k = 1, ..., forward or k-1 = 0, ..., forward-1
+            #
+            extension = []
+            for _ in range(len(expansion), forward):
+                extension.append(-X @ Jk @ Ru)
+                Jk = J @ Jk
+            expansion = expansion + extension
+            self._expansion, self._expansion_power = expansion, Jk
+        return expansion[:forward]
     #]
 
 
+def solve_system(
+    dimensions: SolutionDimensions,
+    system: sy_.System,
+    model_flags: mg_.ModelFlags,
+    /,
+) -> Solution:
+    """
+    Solve a first-order system; module-level so that it can be submitted to
+    a process pool
+    """
+    return Solution.for_model(dimensions, system, model_flags, )
+
+
 def _left_div(A, B):
     """
     Solve A \ B
@@ -234,9 +291,12 @@ def _solve_transition_equations(descriptor, system, qz, ) -> tuple[np_.ndarray,
     #]
 
 
-def _solve_ordqz(system, is_alpha_beta_stable_or_unit_root, is_stable_root, is_unit_root, ):
+def _solve_ordqz(system, is_alpha_beta_stable_or_unit_root, is_stable_root, is_unit_root, qz_blocks=None, ):
     #[
-    S, T, alpha, beta, Q, Z = sp_.linalg.ordqz(system.A, system.B, sort=is_alpha_beta_stable_or_unit_root, )
+    if qz_blocks is None:
+        S, T, alpha, beta, Q, Z = sp_.linalg.ordqz(system.A, system.B, sort=is_alpha_beta_stable_or_unit_root, )
+    else:
+        S, T, alpha, beta, Q, Z = _solve_ordqz_by_blocks(system, is_alpha_beta_stable_or_unit_root, qz_blocks, )
     Q = Q.T
     #
     inx_nonzero_alpha = alpha != 0
@@ -253,6 +313,59 @@ def _solve_ordqz(system, is_alpha_beta_stable_or_unit_root, is_stable_root, is_u
     #]
 
 
+def _solve_ordqz_by_blocks(system, is_alpha_beta_stable_or_unit_root, qz_blocks, ):
+    """
+    Ordered QZ decomposition of a block upper triangular pencil: decompose
+    each diagonal block separately, transform the off-diagonal blocks, and
+    reorder the assembled generalized Schur form so that the stable and
+    unit roots come first
+
+    The result is a valid ordered generalized Schur form of the same pencil,
+    with the same eigenvalues and the same stable deflating subspace as
+    scipy.linalg.ordqz, but not the same factors: the Schur basis differs,
+    and so do Ta, Ra, Ua, X, J and Ru derived from it; the square solution
+    (T, R, K, Z, H, D) and its forward expansion are invariant to the basis
+    """
+    #[
+    row_order, column_order, boundaries = qz_blocks
+    A = system.A[np_.ix_(row_order, column_order)]
+    B = system.B[np_.ix_(row_order, column_order)]
+    blocks = [ slice(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) ]
+    block_qz = [
+        sp_.linalg.ordqz(A[b, b], B[b, b], sort=is_alpha_beta_stable_or_unit_root, )
+        for b in blocks
+    ]
+    Qb = sp_.linalg.block_diag(*(qz[4] for qz in block_qz), )
+    Zb = sp_.linalg.block_diag(*(qz[5] for qz in block_qz), )
+    #
+    # The blocks below the diagonal stay exactly zero, the diagonal blocks
+    # are taken from the block decompositions
+    S = Qb.T @ A @ Zb
+    T = Qb.T @ B @ Zb
+    for b, qz in zip(blocks, block_qz, ):
+        S[b, b] = qz[0]
+        T[b, b] = qz[1]
+    #
+    # Back to the original order of rows and columns
+    Q = np_.empty_like(Qb, )
+    Z = np_.empty_like(Zb, )
+    Q[row_order, :] = Qb
+    Z[column_order, :] = Zb
+    #
+    alpha = np_.concatenate([ qz[2] for qz in block_qz ], )
+    beta = np_.concatenate([ qz[3] for qz in block_qz ], )
+    select = is_alpha_beta_stable_or_unit_root(alpha, beta, )
+    tgsen = sp_.linalg.get_lapack_funcs("tgsen", (S, T, ), )
+    S, T, alphar, alphai, beta, Q, Z, *_, info = tgsen(
+        select, S, T, Q, Z,
+        ijob=0, lwork=4*S.shape[0] + 16, liwork=1,
+    )
+    if info:
+        raise ValueError(f"Reordering of the block QZ decomposition failed with info={info}")
+    return S, T, alphar + 1j*alphai, beta, Q, Z
+    #]
+
+
 def _classify_eig_value_stability(eig_value, is_stable_root, is_unit_root, ) -> EigenValueKind:
     #[
     abs_eig_value = np_.abs(eig_value)
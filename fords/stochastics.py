@@ -0,0 +1,210 @@
+"""
+Stochastic simulation of first-order systems
+"""
+
+
+#[
+from __future__ import annotations
+
+from typing import (Self, NoReturn, )
+from collections.abc import (Iterable, )
+import numpy as np_
+
+from ..fords import (solutions as sl_, descriptors as de_, simulators as sr_, )
+#]
+
+
+"""
+Default number of histogram bins per cell for streaming quantiles
+"""
+DEFAULT_NUM_BINS = 500
+
+
+"""
+Default half-width of the histogram range in standard deviations of the
+warm-up draws
+"""
+DEFAULT_WIDTH = 6
+
+
+"""
+Default number of warm-up draws from which the histogram range is set
+"""
+DEFAULT_WARMUP_SIZE = 500
+
+
+class StreamingSummary:
+    """
+    Running means, standard deviations and quantiles over blocks of draws
+    ---------------------------------------------------------------------
+    * num_bins -- number of histogram bins per cell
+    * width -- half-width of the histogram range in standard deviations of
+    the warm-up draws around their mean
+    * warmup_size -- number of draws kept until the histogram range is set
+    * num_draws -- number of draws summarized so far
+    * _shape -- shape of the cells
+    * _mean, _m2 -- running means and sums of squared deviations
+    * _min, _max -- running minimums and maximums
+    * _warmup -- blocks of draws kept until the histogram range is set
+    * _lower, _step -- lower bound and bin width of the histograms
+    * _counts -- histograms with an underflow and an overflow bin, or None
+    during the warm-up
+
+    Only the histograms are kept after the warm-up, so the memory does not
+    grow with the number of draws; the quantiles are exact up to the bin
+    width, or up to the running minimum and maximum outside the histogram
+    range
+    """
+    #[
+    __slots__ = (
+        "num_bins", "width", "warmup_size", "num_draws", "_shape",
+        "_mean", "_m2", "_min", "_max", "_warmup", "_lower", "_step", "_counts",
+    )
+
+    def __init__(
+        self,
+        /,
+        num_bins: int = DEFAULT_NUM_BINS,
+        width: float = DEFAULT_WIDTH,
+        warmup_size: int = DEFAULT_WARMUP_SIZE,
+    ) -> NoReturn:
+        self.num_bins = int(num_bins)
+        self.width = float(width)
+        self.warmup_size = int(warmup_size)
+        self.num_draws = 0
+        self._warmup = []
+        self._counts = None
+
+    @property
+    def mean(self, /, ) -> np_.ndarray:
+        return self._mean.reshape(self._shape, )
+
+    @property
+    def std(self, /, ) -> np_.ndarray:
+        return np_.sqrt(self._m2 / max(self.num_draws - 1, 1), ).reshape(self._shape, )
+
+    def update(self, block: np_.ndarray, /, ) -> NoReturn:
+        """
+        Add a block of draws; the last axis of block runs over the draws,
+        the other axes over the cells
+        """
+        block_size = block.shape[-1]
+        if not block_size:
+            return
+        self._shape = block.shape[:-1]
+        block = block.reshape(-1, block_size, )
+        block_mean = block.mean(axis=-1, )
+        block_m2 = ((block - block_mean[..., None]) ** 2).sum(axis=-1, )
+        if not self.num_draws:
+            self._mean, self._m2 = block_mean, block_m2
+            self._min = np_.full(block_mean.shape, np_.inf, )
+            self._max = np_.full(block_mean.shape, -np_.inf, )
+        else:
+            # Combine the running and the block moments
+            num_draws = self.num_draws + block_size
+            delta = block_mean - self._mean
+            self._mean = self._mean + delta * (block_size / num_draws)
+            self._m2 = self._m2 + block_m2 + delta**2 * (self.num_draws * block_size / num_draws)
+        self.num_draws += block_size
+        np_.minimum(self._min, block.min(axis=-1, ), out=self._min, )
+        np_.maximum(self._max, block.max(axis=-1, ), out=self._max, )
+        if self._counts is not None:
+            self._add_to_histograms(block, )
+            return
+        self._warmup.append(block, )
+        if self.num_draws >= self.warmup_size:
+            self._end_warmup()
+
+    def get_quantiles(self, probabilities: Iterable[float], /, ) -> np_.ndarray:
+        """
+        Return the quantiles, probabilities × cells, interpolated linearly
+        within the histogram bins
+        """
+        if self._counts is None:
+            self._end_warmup()
+        cumulative = np_.cumsum(self._counts, axis=-1, )
+        quantiles = []
+        for p in probabilities:
+            target = p * self.num_draws
+            bins = np_.argmax(cumulative >= target, axis=-1, )
+            below = np_.take_along_axis(cumulative, bins[:, None] - 1, axis=-1, )[:, 0]
+            below = np_.where(bins > 0, below, 0, )
+            in_bin = np_.take_along_axis(self._counts, bins[:, None], axis=-1, )[:, 0]
+            fraction = np_.divide(target - below, in_bin, out=np_.zeros(bins.shape, ), where=in_bin > 0, )
+            values = self._lower + (bins - 1 + fraction) * self._step
+            values = np_.where(bins == 0, self._min, values, )
+            values = np_.where(bins == self.num_bins + 1, self._max, values, )
+            quantiles.append(np_.clip(values, self._min, self._max, ))
+        return np_.array(quantiles, ).reshape((-1, ) + self._shape, )
+
+    def _end_warmup(self, /, ) -> NoReturn:
+        """
+        Set the histogram range from the moments of the warm-up draws and
+        bin the warm-up draws; cells with no variation get a unit bin
+        width, and their quantiles are the only value seen
+        """
+        half_width = self.width * np_.sqrt(self._m2 / max(self.num_draws - 1, 1), )
+        self._lower = self._mean - half_width
+        self._step = np_.where(half_width > 0, 2 * half_width / self.num_bins, 1, )
+        self._counts = np_.zeros((self._mean.size, self.num_bins + 2, ), dtype=np_.int64, )
+        self._add_to_histograms(np_.concatenate(self._warmup, axis=-1, ), )
+        self._warmup = []
+
+    def _add_to_histograms(self, block: np_.ndarray, /, ) -> NoReturn:
+        """
+        Add a block of draws, cells × draws, to the histograms
+        """
+        # Bin 0 is the underflow bin, bin num_bins+1 is the overflow bin
+        bins = np_.floor((block - self._lower[..., None]) / self._step[..., None], )
+        bins = np_.clip(bins + 1, 0, self.num_bins + 1, ).astype(np_.intp, )
+        offsets = np_.arange(block.shape[0], dtype=np_.intp, ).reshape(-1, 1, ) * (self.num_bins + 2)
+        self._counts += np_.bincount(
+            (bins + offsets).ravel(), minlength=self._counts.size,
+        ).reshape(self._counts.shape, )
+    #]
+
+
+def simulate_stochastic(
+    solution: sl_.Solution,
+    solution_vectors: de_.SolutionVectors,
+    data: np_.ndarray,
+    columns_to_run: list[int],
+    shock_stds: dict[int, float],
+    summary_rows: list[int],
+    deviation: bool,
+    anticipate: bool,
+    /,
+    num_draws: int = 1000,
+    block_size: int = 1000,
+    generator: np_.random.Generator | int | None = None,
+    **kwargs,
+) -> StreamingSummary:
+    """
+    Simulate num_draws draws of normally distributed shocks in blocks of
+    block_size draws and stream the results into a summary
+    ------------------------------------------------------------------
+    * data -- quantities × columns with the initial conditions and the
+    shocks to which the draws are added
+    * shock_stds -- standard deviations of the shocks keyed by their qids
+    * summary_rows -- rows of data to summarize, each over columns_to_run
+    * generator -- numpy random generator or a seed
+    * kwargs -- num_bins=, width= and warmup_size= for the StreamingSummary
+    """
+    #[
+    generator = np_.random.default_rng(generator, )
+    shock_rows = list(shock_stds.keys())
+    stds = np_.array(list(shock_stds.values()), dtype=float, ).reshape(-1, 1, 1, )
+    summary = StreamingSummary(**kwargs, )
+    data = np_.array(data, dtype=float, )[:, :, None]
+    shocks = data[shock_rows, ...]
+    shocks[np_.isnan(shocks)] = 0
+    data[shock_rows, ...] = shocks
+    for block_start in range(0, num_draws, block_size, ):
+        size = min(block_size, num_draws - block_start, )
+        block = np_.repeat(data, size, axis=2, )
+        draws = generator.standard_normal((len(shock_rows), len(columns_to_run), size, ), ) * stds
+        block[np_.ix_(shock_rows, columns_to_run, range(size), )] += draws
+        block = sr_.simulate_batch(solution, solution_vectors, block, columns_to_run, deviation, anticipate, )
+        summary.update(block[np_.ix_(summary_rows, columns_to_run, range(size), )], )
+    return summary
+    #]
@@ -16,6 +16,8 @@ from __future__ import annotations
 
 import dataclasses as dc_
 import numpy as np_ 
+import scipy as sp_
+from typing import (Self, NoReturn, )
 
 from . import descriptors as de_
 #]
@@ -50,49 +52,157 @@ class System:
         value_context: np_.ndarray,
         steady_array: np_.ndarray,
         /,
+        workspace: de_.SystemWorkspace | None = None,
     ) -> NoReturn:
         """
+        Create the system matrices; for a 3-D stack of value contexts
+        (variants × quantities × columns), each matrix gets a leading
+        variant axis, see unstack; for descriptors with sparse_system, see
+        _from_descriptor_sparse; with a workspace, a single system is
+        written into its preallocated matrices, which are overwritten by the
+        next system created in the same workspace
         """
-        # Differentiate and evaluate constant
-        td, tc = descriptor.aldi_context.eval_to_arrays(
-            value_context,
-            logly_context,
-            steady_array,
-        )
-
+        if descriptor.sparse_system:
+            return cls._from_descriptor_sparse(descriptor, logly_context, value_context, steady_array, )
         smap = descriptor.system_map
         svec = descriptor.system_vectors
+        lead_shape = value_context.shape[:-2]
 
-        self = cls()
-
-        self.A = np_.zeros(svec.shape_AB_excl_dynid, dtype=float)
-        self.A[smap.A.lhs] = td[smap.A.rhs]
-        self.A = np_.vstack((self.A, smap.dynid_A))
+        matrices = (
+            workspace.get_system_matrices(svec, smap, )
+            if workspace is not None and not lead_shape else None
+        )
 
-        self.B = np_.zeros(svec.shape_AB_excl_dynid, dtype=float)
-        self.B[smap.B.lhs] = td[smap.B.rhs]
-        self.B = np_.vstack((self.B, smap.dynid_B))
+        self = cls()
+        if matrices is not None:
+            # Refill the preallocated matrices in place; the dynamic
+            # identity rows are already there
+            for n, (_, excl_dynid) in matrices.items():
+                excl_dynid.fill(0, )
+                setattr(self, n, excl_dynid, )
+        else:
+            self.A = np_.zeros(lead_shape + svec.shape_AB_excl_dynid, dtype=float)
+            self.B = np_.zeros(lead_shape + svec.shape_AB_excl_dynid, dtype=float)
+            self.C = np_.zeros(lead_shape + svec.shape_C_excl_dynid, dtype=float)
+            self.D = np_.zeros(lead_shape + svec.shape_D_excl_dynid, dtype=float)
+            self.F = np_.zeros(lead_shape + svec.shape_F, dtype=float)
+            self.G = np_.zeros(lead_shape + svec.shape_G, dtype=float)
+            self.H = np_.zeros(lead_shape + svec.shape_H, dtype=float)
+            self.J = np_.zeros(lead_shape + svec.shape_J, dtype=float)
+
+        system_function = descriptor.system_function
+        if system_function is not None and system_function.accepts(logly_context):
+            # Code-generated derivatives written directly into the matrices
+            system_function(value_context, steady_array, self, )
+        else:
+            # Differentiate and evaluate constant
+            td, tc = descriptor.aldi_context.eval_to_arrays(
+                value_context,
+                logly_context,
+                steady_array,
+            )
+            smap.A.transfer(self.A, td, )
+            smap.B.transfer(self.B, td, )
+            smap.C.transfer(self.C, tc, )
+            smap.D.transfer(self.D, td, )
+            smap.F.transfer(self.F, td, )
+            smap.G.transfer(self.G, td, )
+            smap.H.transfer(self.H, tc, )
+            smap.J.transfer(self.J, td, )
+
+        if matrices is not None:
+            return cls(**{ n: full for n, (full, _) in matrices.items() })
+
+        self.A = _vstack(self.A, smap.dynid_A, )
+        self.B = _vstack(self.B, smap.dynid_B, )
+        self.C = _vstack(self.C, smap.dynid_C, )
+        self.D = _vstack(self.D, smap.dynid_D, )
 
-        self.C = np_.zeros(svec.shape_C_excl_dynid, dtype=float)
-        self.C[smap.C.lhs] = tc[smap.C.rhs]
-        self.C = np_.vstack((self.C, smap.dynid_C))
+        return self
 
-        self.D = np_.zeros(svec.shape_D_excl_dynid, dtype=float)
-        self.D[smap.D.lhs] = td[smap.D.rhs]
-        self.D = np_.vstack((self.D, smap.dynid_D))
+    @classmethod
+    def _from_descriptor_sparse(
+        cls,
+        descriptor: de_.Descriptor,
+        logly_context: dict[int, bool],
+        value_context: np_.ndarray,
+        steady_array: np_.ndarray,
+        /,
+    ) -> Self:
+        """
+        Create the system matrices as scipy sparse (CSR) matrices built
+        directly from the nonzero derivatives, with the dynamic identity rows
+        kept sparse; the constant vectors C and H stay dense; a single 2-D
+        value context only
+        """
+        if value_context.ndim != 2:
+            raise ValueError("Sparse systems are created for one variant at a time")
+        smap = descriptor.system_map
+        svec = descriptor.system_vectors
+        td, tc = descriptor.aldi_context.eval_to_arrays(
+            value_context,
+            logly_context,
+            steady_array,
+        )
+        create_sparse = lambda map, shape: sp_.sparse.csr_matrix(
+            (td[map.rhs], map.lhs, ), shape=shape, dtype=float,
+        )
+        self = cls()
+        self.A = sp_.sparse.vstack((create_sparse(smap.A, svec.shape_AB_excl_dynid, ), smap.sparse_dynid_A, ), format="csr", )
+        self.B = sp_.sparse.vstack((create_sparse(smap.B, svec.shape_AB_excl_dynid, ), smap.sparse_dynid_B, ), format="csr", )
+        self.C = np_.zeros(svec.shape_C_excl_dynid, dtype=float, )
+        smap.C.transfer(self.C, tc, )
+        self.C = _vstack(self.C, smap.dynid_C, )
+        self.D = sp_.sparse.vstack((create_sparse(smap.D, svec.shape_D_excl_dynid, ), sp_.sparse.csr_matrix(smap.dynid_D.shape, ), ), format="csr", )
+        self.F = create_sparse(smap.F, svec.shape_F, )
+        self.G = create_sparse(smap.G, svec.shape_G, )
+        self.H = np_.zeros(svec.shape_H, dtype=float, )
+        smap.H.transfer(self.H, tc, )
+        self.J = create_sparse(smap.J, svec.shape_J, )
+        return self
 
-        self.F = np_.zeros(svec.shape_F, dtype=float)
-        self.F[smap.F.lhs] = td[smap.F.rhs]
+    @property
+    def is_sparse(self, /, ) -> bool:
+        """
+        True if the system matrices are scipy sparse matrices
+        """
+        return sp_.sparse.issparse(self.A)
 
-        self.G = np_.zeros(svec.shape_G, dtype=float)
-        self.G[smap.G.lhs] = td[smap.G.rhs]
+    def to_dense(self, /, ) -> Self:
+        """
+        Return the system with all matrices as numpy arrays; self if the
+        system is already dense
+        """
+        if not self.is_sparse:
+            return self
+        return type(self)(**{
+            n: getattr(self, n).toarray() if sp_.sparse.issparse(getattr(self, n)) else getattr(self, n)
+            for n in _MATRIX_NAMES
+        })
+
+    def unstack(self, /, ) -> list[Self]:
+        """
+        Split a system with a leading variant axis into one system per
+        variant; each system owns copies of its matrices, so that the stacked
+        arrays are released
+        """
+        return [
+            type(self)(**{ n: getattr(self, n)[i].copy() for n in _MATRIX_NAMES })
+            for i in range(self.A.shape[0])
+        ]
 
-        self.H = np_.zeros(svec.shape_H, dtype=float)
-        self.H[smap.H.lhs] = tc[smap.H.rhs]
 
-        self.J = np_.zeros(svec.shape_J, dtype=float)
-        self.J[smap.J.lhs] = td[smap.J.rhs]
+_MATRIX_NAMES = ("A", "B", "C", "D", "F", "G", "H", "J", )
 
-        return self
 
+def _vstack(
+    excl_dynid: np_.ndarray,
+    dynid: np_.ndarray,
+    /,
+) -> np_.ndarray:
+    """
+    Append the dynamic identity rows, broadcast along any leading axes
+    """
+    dynid = np_.broadcast_to(dynid, excl_dynid.shape[:-2] + dynid.shape, )
+    return np_.concatenate((excl_dynid, dynid, ), axis=-2, )
 
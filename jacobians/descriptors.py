@@ -6,12 +6,12 @@
 from __future__ import annotations
 
 from typing import (Self, NoReturn, )
-from collections.abc import (Iterable, )
+from collections.abc import (Iterable, Callable, )
 import dataclasses as dc_
 import numpy as np_
 import scipy as sp_
 
-from ..aldi import (differentiators as ad_, maps as am_, )
+from ..aldi import (differentiators as ad_, maps as am_, invariators as ai_, )
 from .. import (equations as eq_, quantities as qu_, incidence as in_, )
 #]
 
@@ -32,17 +32,20 @@ class Descriptor:
     * _aldi_context -- context for algorithmic differentiator
     * _create_jacobian -- function to create a dense or sparse Jacobian matrix
     * is_sparse -- whether the Jacobian matrix is sparse
+    * _invariant_cache -- cache of the derivatives of equations that are
+    invariant in the wrt quantities if aldi_invariance=True, or None
     """
     #[
     __slots__ = (
         "_num_rows", "_num_columns", "_map", "_qid_to_logly", "_aldi_context",
-        "_create_jacobian", "is_sparse",
+        "_create_jacobian", "is_sparse", "_invariant_cache",
     )
 
     def __init__(self, /, **kwargs, ) -> None:
         """
         """
         self.is_sparse = kwargs.get("sparse_jacobian", False)
+        self._invariant_cache = None
         if self.is_sparse:
             self._create_jacobian = self._create_sparse_jacobian
         else:
@@ -91,10 +94,21 @@ class Descriptor:
         )
         #
         num_columns = 1
-        self._aldi_context = ad_.Context.for_equations(
+        create_aldi_context = lambda equations: ad_.Context.for_equations(
             AtomFactory, equations, eid_to_wrt_qids,
             num_columns, function_context,
+            tape=kwargs.get("aldi_tape", False),
+            finite_diff=kwargs.get("aldi_finite_diff", "central"),
+            compile_workers=kwargs.get("compile_workers", ),
         )
+        self._aldi_context = create_aldi_context(equations, )
+        #
+        if kwargs.get("aldi_invariance", False):
+            self._invariant_cache = _InvariantCache.for_equations(
+                self._aldi_context, equations, all_wrt_qids,
+                eid_to_rhs_offset, eid_to_wrt_qids, qid_to_logly,
+                create_aldi_context,
+            )
         #
         return self
 
@@ -106,9 +120,40 @@ class Descriptor:
     ) -> np_.ndarray:
         """
         """
-        diff_array = self._aldi_context.eval_diff_to_array(data_context, self._qid_to_logly, L, )
+        if self._invariant_cache is not None:
+            diff_array = self._invariant_cache.eval(self._aldi_context, data_context, self._qid_to_logly, L, )
+        else:
+            diff_array = self._aldi_context.eval_diff_to_array(data_context, self._qid_to_logly, L, )
         return self._create_jacobian(diff_array, self._map, )
 
+    def eval_weighted_hessian_vector(
+        self,
+        data_context: np_.ndarray,
+        L: np_.ndarray,
+        weights: np_.ndarray,
+        vector: np_.ndarray,
+        /,
+    ) -> np_.ndarray:
+        """
+        Evaluate sum_i weights_i * H_i @ vector, where H_i is the exact
+        Hessian of the i-th equation w.r.t. the columns of the Jacobian
+        """
+        rows, columns = self._map.lhs
+        rhs_rows = self._map.rhs[0]
+        #
+        # Direction component for the wrt quantity of each row of the
+        # stacked diff array
+        vector = np_.asarray(vector, dtype=float, ).reshape(-1)
+        direction = np_.zeros(rhs_rows.size, dtype=float, )
+        direction[rhs_rows] = vector[columns]
+        diff_dot_array = self._aldi_context.eval_diff_dot_to_array(data_context, self._qid_to_logly, L, direction, )
+        weights = np_.asarray(weights, dtype=float, ).reshape(-1)
+        return np_.bincount(
+            columns,
+            weights=weights[rows] * diff_dot_array[rhs_rows, 0],
+            minlength=self._num_columns,
+        )
+
     def _create_dense_jacobian(self, diff_array, map, /, ) -> np_.ndarray:
         """
         Create Jacobian as numpy array
@@ -117,7 +162,7 @@ class Descriptor:
             (self._num_rows, self._num_columns, ),
             dtype=float,
         )
-        J[map.lhs] = diff_array[map.rhs]
+        map.transfer(J, diff_array, )
         return J
 
     def _create_sparse_jacobian(self, diff_array, map, /, ) -> sp_.sparse.coo_matrix:
@@ -130,6 +175,93 @@ class Descriptor:
             dtype=float,
         )
         return J
+    #]
+
+
+class _InvariantCache:
+    """
+    Derivatives of the equations whose Jacobian entries are all invariant
+    in the wrt quantities, computed once per assignment of the remaining
+    data (parameters and fixed quantities)
+    -----------------------------------------------------------------------
+    * variant_context -- differentiator context for the remaining equations,
+    or None if all equations are invariant
+    * variant_rows -- rows of the stacked diff array produced by the
+    variant context
+    * wrt_qids -- rows of the data context that change between evaluations
+    * _entry -- last (key, diff array) pair
+    """
+    #[
+    __slots__ = ("variant_context", "variant_rows", "wrt_qids", "_entry", )
+
+    @classmethod
+    def for_equations(
+        cls,
+        aldi_context: ad_.Context,
+        equations: eq_.Equations,
+        wrt_qids: Iterable[int],
+        eid_to_rhs_offset: dict[int, int],
+        eid_to_wrt_qids: dict[int, list[int]],
+        qid_to_logly: dict[int, bool],
+        create_aldi_context: Callable,
+        /,
+    ) -> Self | None:
+        """
+        Run the invariance analysis and return None if no equation is
+        invariant or the equations cannot be analyzed
+        """
+        masks = ai_.create_invariance_masks(aldi_context, qid_to_logly, )
+        if masks is None:
+            return None
+        equations = list(equations)
+        variant_equations = [
+            eqn for eqn, mask in zip(equations, masks, )
+            if mask is None or not mask.all()
+        ]
+        if len(variant_equations) == len(equations):
+            return None
+        self = cls()
+        self.variant_context = create_aldi_context(variant_equations, ) if variant_equations else None
+        self.variant_rows = np_.array([
+            row
+            for eqn in variant_equations
+            for row in range(eid_to_rhs_offset[eqn.id], eid_to_rhs_offset[eqn.id] + len(eid_to_wrt_qids[eqn.id]))
+        ], dtype=int, )
+        self.wrt_qids = np_.array(sorted(set(wrt_qids)), dtype=int, )
+        self._entry = None
+        return self
+
+    def eval(
+        self,
+        aldi_context: ad_.Context,
+        data_context: np_.ndarray,
+        logly_context: dict[int, bool],
+        L: np_.ndarray | None,
+        /,
+    ) -> np_.ndarray:
+        """
+        Evaluate the diff array, differentiating all equations only when
+        the data other than the wrt quantities have changed
+        """
+        key = self._create_key(data_context, L, )
+        entry = self._entry
+        if entry is None or entry[0] != key:
+            diff_array = aldi_context.eval_diff_to_array(data_context, logly_context, L, )
+            self._entry = (key, diff_array, )
+            return diff_array
+        diff_array = entry[1].copy()
+        if self.variant_context is not None:
+            diff_array[..., self.variant_rows, :] = self.variant_context.eval_diff_to_array(data_context, logly_context, L, )
+        return diff_array
+
+    def _create_key(self, data_context, L, /, ) -> tuple:
+        fixed_data = np_.delete(data_context, self.wrt_qids[self.wrt_qids < data_context.shape[-2]], axis=-2, )
+        return (
+            data_context.shape,
+            fixed_data.tobytes(),
+            L.tobytes() if L is not None else None,
+        )
+    #]
 
 
 #••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••••
@@ -156,7 +288,7 @@ class AtomFactory():
         token: Token,
         wrt_qids: Tokens,
         /,
-    ) -> np_.ndarray:
+    ) -> np_.ndarray | int:
         """
         """
         if token.qid in wrt_qids:
@@ -0,0 +1,135 @@
+"""
+Cache of first-order solutions keyed by parameter fingerprints
+"""
+
+
+#[
+from __future__ import (annotations, )
+
+from typing import (Self, NoReturn, )
+from collections import (OrderedDict, )
+import hashlib as hl_
+import threading as th_
+import numpy as np_
+
+from ..fords import (solutions as sl_, )
+from . import (variants as va_, flags as mg_, )
+#]
+
+
+"""
+Default memory budget of a solution cache in bytes
+"""
+DEFAULT_BUDGET = 64 * 1024**2
+
+
+class SolutionCache:
+    """
+    Least-recently-used cache of solutions within a memory budget
+    --------------------------------------------------------------
+    * budget -- maximum total size of the cached solution matrices in bytes;
+    zero disables the cache
+    * _entries -- solutions keyed by fingerprint, least recently used first
+    * _sizes -- sizes of the cached solutions in bytes
+    * _total_size -- total size of the cached solutions in bytes
+
+    The cache is shared (not copied) by copies of a Model; the fingerprints
+    depend on the values only, so this is safe. The cache holds and hands
+    out copies of the solutions without their forward expansions, so that
+    expansions grown by the variants never add to the cached sizes
+    """
+    #[
+    __slots__ = ("budget", "_entries", "_sizes", "_total_size", "_lock", )
+
+    def __init__(self, /, budget: int = DEFAULT_BUDGET, ) -> NoReturn:
+        self.budget = int(budget or 0)
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_size = 0
+        self._lock = th_.Lock()
+
+    def __len__(self, /, ) -> int:
+        return len(self._entries)
+
+    def __deepcopy__(self, memo, /, ) -> Self:
+        return self
+
+    @property
+    def total_size(self, /, ) -> int:
+        return self._total_size
+
+    def get(self, key: str, /, ) -> sl_.Solution | None:
+        """
+        Return a copy of the cached solution and mark it most recently used,
+        or None
+        """
+        with self._lock:
+            solution = self._entries.get(key, )
+            if solution is None:
+                return None
+            self._entries.move_to_end(key, )
+        return solution.copy_without_expansion()
+
+    def put(self, key: str, solution: sl_.Solution, /, ) -> NoReturn:
+        """
+        Cache a solution, evicting the least recently used ones beyond the
+        budget; solutions larger than the budget are not cached
+        """
+        solution = solution.copy_without_expansion()
+        size = _get_solution_size(solution, )
+        if size > self.budget:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, )
+            self._entries[key] = solution
+            self._sizes[key] = size
+            self._total_size += size
+            while self._total_size > self.budget:
+                self._remove(next(iter(self._entries)), )
+
+    def clear(self, /, ) -> NoReturn:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_size = 0
+
+    def _remove(self, key: str, /, ) -> NoReturn:
+        del self._entries[key]
+        self._total_size -= self._sizes.pop(key, )
+    #]
+
+
+def create_solution_key(
+    variant: va_.Variant,
+    qid_to_logly: dict[int, bool],
+    model_flags: mg_.ModelFlags,
+    /,
+) -> str:
+    """
+    Fingerprint of everything a first-order solution depends on besides the
+    model equations: the levels and changes of all quantities (parameters
+    and the steady state), the log status of the quantities and the model
+    flags
+    """
+    #[
+    fingerprint = hl_.blake2b(digest_size=20, )
+    fingerprint.update(np_.ascontiguousarray(variant.levels, dtype=float, ).tobytes(), )
+    fingerprint.update(np_.ascontiguousarray(variant.changes, dtype=float, ).tobytes(), )
+    fingerprint.update(repr(sorted(qid_to_logly.items())).encode(), )
+    fingerprint.update(int(model_flags).to_bytes(8, "little", ), )
+    return fingerprint.hexdigest()
+    #]
+
+
+def _get_solution_size(solution: sl_.Solution, /, ) -> int:
+    """
+    Total size of the arrays held by a solution in bytes
+    """
+    #[
+    return sum(
+        getattr(solution, n, ).nbytes
+        for n in solution.__slots__
+        if isinstance(getattr(solution, n, None, ), np_.ndarray, )
+    )
+    #]
@@ -12,13 +12,14 @@ import copy as co_
 import numpy as np_
 import itertools as it_
 import functools as ft_
+import concurrent.futures as cf_
 
 from .. import (equations as eq_, quantities as qu_, wrongdoings as wd_, )
 from ..parsers import (common as pc_, )
 from ..dataman import (databanks as db_, dates as da_)
 from ..fords import (solutions as sl_, steadiers as fs_, descriptors as de_, systems as sy_, )
 
-from . import (simulations as si_, evaluators as me_, sources as ms_, getters as ge_, variants as va_, invariants as in_, flags as mg_, )
+from . import (simulations as si_, kalmans as mk_, evaluators as me_, sources as ms_, getters as ge_, variants as va_, invariants as in_, flags as mg_, caches as mc_, )
 #]
 
 
@@ -45,6 +46,7 @@ _EquationSwitch: TypeAlias = Literal["dynamic"] | Literal["steady"]
 
 class Model(
     si_.SimulationMixin,
+    mk_.KalmanMixin,
     me_.SteadyEvaluatorMixin,
     ge_.GetterMixin,
 ):
@@ -242,13 +244,14 @@ class Model(
         **kwargs,
     ) -> Iterable[sy_.System]:
         """
-        Create unsolved first-order system for each variant
+        Create unsolved first-order system for each variant; the variants
+        are evaluated in chunks of systemize_chunk_size=n variants
         """
         model_flags = self._invariant._flags.update_from_kwargs(**kwargs, )
-        return [ 
-            self._systemize(variant, self._invariant._dynamic_descriptor, model_flags, ) 
-            for variant in self._variants
-        ]
+        return self._systemize_variants(
+            self._variants, self._invariant._dynamic_descriptor, model_flags,
+            chunk_size=kwargs.get("systemize_chunk_size", ),
+        )
 
     def _systemize(
         self,
@@ -256,20 +259,89 @@ class Model(
         descriptor: de_.Descriptor,
         model_flags: mg_.ModelFlags,
         /,
+        workspace: bool = False,
     ) -> sy_.System:
         """
-        Create unsolved first-order system for one variant
+        Create unsolved first-order system for one variant; with
+        workspace=True, the value context and the system matrices are
+        written into the preallocated buffers of the descriptor, and the
+        system is only valid until the next call with workspace=True
+        """
+        qid_to_logly = self.create_qid_to_logly()
+        workspace = descriptor.workspace if workspace and not descriptor.sparse_system else None
+        value_context, L = self._create_value_context(variant, descriptor, qid_to_logly, model_flags, workspace=workspace, )
+        return sy_.System.from_descriptor(descriptor, qid_to_logly, value_context, L, workspace=workspace, )
+
+    def _systemize_variants(
+        self,
+        variants: Iterable[va_.Variant],
+        descriptor: de_.Descriptor,
+        model_flags: mg_.ModelFlags,
+        /,
+        workspace: bool = False,
+        chunk_size: int | None = None,
+    ) -> list[sy_.System]:
+        """
+        Create unsolved first-order systems for several variants, evaluating
+        the aldi context over the stacked value contexts of at most
+        chunk_size variants at a time; a single variant is created in the
+        workspace of the descriptor if workspace=True, see _systemize
+        """
+        if len(variants) == 1:
+            return [ self._systemize(variants[0], descriptor, model_flags, workspace=workspace, ) ]
+        if descriptor.sparse_system:
+            # Sparse systems are created variant by variant
+            return [ self._systemize(v, descriptor, model_flags, ) for v in variants ]
+        qid_to_logly = self.create_qid_to_logly()
+        chunk_size = max(int(chunk_size or _DEFAULT_SYSTEMIZE_CHUNK_SIZE), 1, )
+        systems = []
+        for start in range(0, len(variants), chunk_size, ):
+            value_contexts, steady_arrays = zip(*(
+                self._create_value_context(v, descriptor, qid_to_logly, model_flags, )
+                for v in variants[start:start+chunk_size]
+            ))
+            stacked_system = sy_.System.from_descriptor(
+                descriptor, qid_to_logly,
+                np_.stack(value_contexts, ), np_.stack(steady_arrays, ),
+            )
+            systems.extend(stacked_system.unstack(), )
+        return systems
+
+    def _create_value_context(
+        self,
+        variant: va_.Variant,
+        descriptor: de_.Descriptor,
+        qid_to_logly: dict[int, bool],
+        model_flags: mg_.ModelFlags,
+        /,
+        workspace: de_.SystemWorkspace | None = None,
+    ) -> tuple[np_.ndarray, np_.ndarray]:
+        """
+        Create the value context and steady array at which the first-order
+        system is evaluated for one variant; the value context is written
+        into the buffer of the workspace if given; the logly masks and shift
+        vectors are cached in the workspace of the descriptor in any case
         """
         ac = descriptor.aldi_context
         num_columns = ac.shape_data[1]
-        qid_to_logly = self.create_qid_to_logly()
+        out = (
+            workspace.get_value_context((variant.levels.size, num_columns, ), )
+            if workspace is not None else None
+        )
+        logly_masks = descriptor.workspace.get_logly_masks(qid_to_logly, variant.levels.size, )
         if model_flags.is_linear:
-            value_context = variant.create_zero_array(qid_to_logly, num_columns=num_columns, shift_in_first_column=ac.min_shift)
+            value_context = variant.create_zero_array(
+                qid_to_logly, num_columns=num_columns, shift_in_first_column=ac.min_shift, out=out,
+                logly_masks=logly_masks,
+            )
             L = variant.create_steady_array(qid_to_logly, num_columns=1, ).reshape(-1)
         else:
-            value_context = variant.create_steady_array(qid_to_logly, num_columns=num_columns, )
+            value_context = variant.create_steady_array(
+                qid_to_logly, num_columns=num_columns, out=out,
+                logly_masks=logly_masks, shift_vec=descriptor.workspace.get_shift_vec(0, num_columns, ),
+            )
             L = value_context[:, -ac.min_shift]
-        return sy_.System.from_descriptor(descriptor, qid_to_logly, value_context, L, )
+        return value_context, L
 
     def solve(
         self,
@@ -277,22 +349,59 @@ class Model(
         **kwargs,
     ) -> NoReturn:
         """
-        Calculate first-order solution for each Variant within this Model
+        Calculate first-order solution for each Variant within this Model;
+        variants whose values have not changed since they (or any other
+        variant) were last solved get the cached solution, unless
+        cache=False; the other variants are solved in parallel with
+        executor="thread" or "process" (or a concurrent.futures executor)
+        and/or workers=n, see _map_variants; the systems of the other
+        variants are evaluated in chunks of systemize_chunk_size=n variants
         """
         model_flags = self._invariant._flags.update_from_kwargs(**kwargs, )
-        for variant in self._variants:
-            self._solve(variant, model_flags, )
+        cache = self._invariant._solution_cache if kwargs.get("cache", True) else None
+        if cache is None or not cache.budget:
+            variants = self._variants
+            keys = [None] * len(variants)
+        else:
+            qid_to_logly = self.create_qid_to_logly()
+            variants, keys = [], []
+            for variant in self._variants:
+                key = mc_.create_solution_key(variant, qid_to_logly, model_flags, )
+                solution = cache.get(key, )
+                if solution is not None:
+                    variant.solution = solution
+                    continue
+                variants.append(variant)
+                keys.append(key)
+        if not variants:
+            return
+        descriptor = self._invariant._dynamic_descriptor
+        systems = self._systemize_variants(
+            variants, descriptor, model_flags,
+            workspace=True, chunk_size=kwargs.get("systemize_chunk_size", ),
+        )
+        dimensions = sl_.SolutionDimensions.for_descriptor(descriptor, )
+        solutions = _map_variants(
+            sl_.solve_system, it_.repeat(dimensions, ), systems, it_.repeat(model_flags, ),
+            executor=kwargs.get("executor", ), workers=kwargs.get("workers", ),
+        )
+        for variant, solution, key in zip(variants, solutions, keys, ):
+            variant.solution = solution
+            if key is not None:
+                cache.put(key, solution, )
 
     def _solve(
         self,
         variant: va_.Variant,
         model_flags: mg_.ModelFlags,
         /,
+        system: sy_.System | None = None,
     ) -> NoReturn:
         """
         Calculate first-order solution for one Variant of this Model
         """
-        system = self._systemize(variant, self._invariant._dynamic_descriptor, model_flags, )
+        if system is None:
+            system = self._systemize(variant, self._invariant._dynamic_descriptor, model_flags, workspace=True, )
         variant.solution = sl_.Solution.for_model(self._invariant._dynamic_descriptor, system, model_flags, )
 
     def steady(
@@ -301,12 +410,21 @@ class Model(
         **kwargs, 
     ) -> dict:
         """
-        Calculate steady state for each Variant within this Model
+        Calculate steady state for each Variant within this Model; the
+        variants are solved in parallel with executor= and/or workers=, see
+        _map_variants; the steady solvers hold compiled evaluators that
+        cannot be sent to other processes, so executor="process" runs in
+        threads
         """
         model_flags = mg_.ModelFlags.update_from_kwargs(self._invariant._flags, **kwargs)
         solver = self._choose_steady_solver(model_flags)
-        for v in self._variants:
-            levels, qids_levels, changes, qids_changes = solver(v, model_flags, )
+        executor = kwargs.get("executor", )
+        results = _map_variants(
+            solver, self._variants, it_.repeat(model_flags, ),
+            executor="thread" if executor == "process" else executor,
+            workers=kwargs.get("workers", ),
+        )
+        for v, (levels, qids_levels, changes, qids_changes) in zip(self._variants, results, ):
             v.update_levels_from_array(levels, qids_levels, )
             v.update_changes_from_array(changes, qids_changes, )
 
@@ -372,10 +490,10 @@ class Model(
         """
         #
         # Calculate first-order system for steady equations for this variant
-        sys = self._systemize(variant, self._invariant._steady_descriptor, model_flags, )
+        sys = self._systemize(variant, self._invariant._steady_descriptor, model_flags, workspace=True, )
         #
         # Calculate steady state for this variant
-        Xi, Y, dXi, dY = algorithm(sys)
+        Xi, Y, dXi, dY = algorithm(sys.to_dense())
         levels = np_.hstack(( Xi.flat, Y.flat ))
         changes = np_.hstack(( dXi.flat, dY.flat ))
         #
@@ -539,6 +657,8 @@ _DEFAULT_STD_LINEAR = 1
 
 _DEFAULT_STD_NONLINEAR = 0.01
 
+_DEFAULT_SYSTEMIZE_CHUNK_SIZE = 16
+
 
 def _rekey_dict(dict_to_rekey: dict, old_key_to_new_key: dict, /, garbage_key=None) -> dict:
     #[
@@ -579,3 +699,35 @@ def _apply_delog_on_vector(
         vector[logly_index] = np_.exp(vector[logly_index])
     return vector
 
+
+
+def _map_variants(
+    func: Callable,
+    /,
+    *iterables,
+    executor: Literal["thread", "process"] | cf_.Executor | None = None,
+    workers: int | None = None,
+) -> list:
+    """
+    Map a function over variants, in order
+    ---------------------------------------
+    * executor=None -- serial, unless workers > 1, in which case threads
+    are used; LAPACK releases the GIL
+    * executor="thread" or "process" -- a new pool with workers workers
+    (default chosen by concurrent.futures), shut down afterwards
+    * executor=<concurrent.futures.Executor> -- an existing pool, left
+    running
+    """
+    #[
+    if isinstance(executor, cf_.Executor):
+        return list(executor.map(func, *iterables, ))
+    if executor is None and not (workers and workers > 1):
+        return list(map(func, *iterables, ))
+    pool_class = {
+        None: cf_.ThreadPoolExecutor,
+        "thread": cf_.ThreadPoolExecutor,
+        "process": cf_.ProcessPoolExecutor,
+    }[executor]
+    with pool_class(max_workers=workers, ) as pool:
+        return list(pool.map(func, *iterables, ))
+    #]
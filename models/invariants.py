@@ -7,11 +7,11 @@ from __future__ import (annotations, )
 
 from typing import (Self, NoReturn, Callable, )
 
-from .. import (equations as eq_, quantities as qu_, wrongdoings as wd_, )
-from ..fords import (descriptors as fd_, )
+from .. import (equations as eq_, quantities as qu_, wrongdoings as wd_, compilers as cm_, )
+from ..fords import (descriptors as fd_, codegens as fc_, )
 from ..evaluators import (plains as ep_, )
 
-from . import (facade as mf_, evaluators as me_, flags as mg_, )
+from . import (facade as mf_, evaluators as me_, flags as mg_, caches as mc_, )
 #]
 
 
@@ -41,20 +41,59 @@ class Invariant:
         name_to_qid = qu_.create_name_to_qid(self._quantities, )
         eq_.finalize_dynamic_equations(self._dynamic_equations, name_to_qid, )
         eq_.finalize_steady_equations(self._steady_equations, name_to_qid, )
+        #
+        # Equations without steady-state versions (!!) are textually
+        # identical in the dynamic and steady lists; they are compiled apart
+        # from those with steady versions, so that the steady descriptor and
+        # evaluator reuse their cached chunks, and only the steady versions
+        # are compiled again; without any steady versions, all compiled
+        # artifacts are shared
+        steady_eids = _get_differing_eids(self._dynamic_equations, self._steady_equations, )
+        shares_steady = not steady_eids
         if needs_check_syntax:
-            _check_syntax(self._dynamic_equations, self._function_context, )
-            _check_syntax(self._steady_equations, self._function_context, )
+            _check_syntax(self._dynamic_equations, self._function_context, separate_eids=steady_eids, **kwargs, )
+            if steady_eids:
+                _check_syntax(
+                    [ eqn for eqn in self._steady_equations if eqn.id in steady_eids ],
+                    self._function_context, **kwargs,
+                )
         #
-        self._dynamic_descriptor = fd_.Descriptor(self._dynamic_equations, self._quantities, self._function_context, )
-        self._steady_descriptor = fd_.Descriptor(self._steady_equations, self._quantities, self._function_context, )
+        self._dynamic_descriptor = fd_.Descriptor(
+            self._dynamic_equations, self._quantities, self._function_context,
+            separate_eids=steady_eids, **kwargs,
+        )
+        self._steady_descriptor = (
+            self._dynamic_descriptor if shares_steady
+            else fd_.Descriptor(
+                self._steady_equations, self._quantities, self._function_context,
+                separate_eids=steady_eids, **kwargs,
+            )
+        )
+        if kwargs.get("symbolic_jacobian", False):
+            self._populate_system_functions()
         #
         dynamic_equations_for_plain_evaluator = eq_.generate_equations_of_kind(self._dynamic_equations, me_.STEADY_EVALUATOR_EQUATION, )
-        self._plain_evaluator_for_dynamic_equations = ep_.PlainEvaluator(dynamic_equations_for_plain_evaluator, self._function_context, )
+        self._plain_evaluator_for_dynamic_equations = ep_.PlainEvaluator(
+            dynamic_equations_for_plain_evaluator, self._function_context,
+            compile_workers=kwargs.get("compile_workers", ),
+            separate_eids=steady_eids,
+        )
         #
-        steady_equations_for_plain_evaluator = eq_.generate_equations_of_kind(self._steady_equations, me_.STEADY_EVALUATOR_EQUATION, )
-        self._plain_evaluator_for_steady_equations = ep_.PlainEvaluator(steady_equations_for_plain_evaluator, self._function_context, )
+        if shares_steady:
+            self._plain_evaluator_for_steady_equations = self._plain_evaluator_for_dynamic_equations
+        else:
+            steady_equations_for_plain_evaluator = eq_.generate_equations_of_kind(self._steady_equations, me_.STEADY_EVALUATOR_EQUATION, )
+            self._plain_evaluator_for_steady_equations = ep_.PlainEvaluator(
+                steady_equations_for_plain_evaluator, self._function_context,
+                compile_workers=kwargs.get("compile_workers", ),
+                separate_eids=steady_eids,
+            )
         #
         self._populate_min_max_shifts()
+        #
+        self._solution_cache = mc_.SolutionCache(
+            budget=kwargs.get("solution_cache_budget", mc_.DEFAULT_BUDGET, ),
+        )
 
     def _populate_min_max_shifts(self, /, ) -> NoReturn:
         """
@@ -66,6 +105,22 @@ class Invariant:
             self._dynamic_equations + self._steady_equations,
         )
 
+    def _populate_system_functions(self, /, ) -> NoReturn:
+        """
+        Differentiate the dynamic and steady equations symbolically once and
+        store the generated system functions with their descriptors; models
+        with equations that cannot be differentiated symbolically keep using
+        the algorithmic differentiator
+        """
+        qid_to_logly = qu_.create_qid_to_logly(self._quantities, )
+        for descriptor, equations in (
+            (self._dynamic_descriptor, self._dynamic_equations, ),
+            (self._steady_descriptor, self._steady_equations, ),
+        ):
+            if descriptor.system_function is not None:
+                continue
+            descriptor.system_function = fc_.SystemFunction.for_descriptor(descriptor, equations, qid_to_logly, )
+
     def _populate_function_context(
         self,
         context: dict | None,
@@ -80,13 +135,42 @@ class Invariant:
     #]
 
 
-def _check_syntax(equations, function_context, /, ):
+def _get_differing_eids(
+    equations: eq_.Equations,
+    other_equations: eq_.Equations,
+    /,
+) -> set[int]:
     """
-    Try all equations at once; if this fails, do equation by equation to # catch the troublemakers
+    Ids of the finalized equations whose kinds, xtrings or incidences
+    differ between two lists, equation by equation; all ids if the lists do
+    not match by ids
     """
+    #[
+    if [ e.id for e in equations ] != [ o.id for o in other_equations ]:
+        return { eqn.id for eqn in equations + other_equations }
+    key = lambda eqn: (eqn.kind, eqn.xtring, tuple(eqn.incidence), )
+    return {
+        e.id for e, o in zip(equations, other_equations, )
+        if key(e) != key(o)
+    }
+    #]
+
+
+def _check_syntax(equations, function_context, /, separate_eids=(), **kwargs, ):
+    """
+    Compile all equations in chunks; the compiled chunks are cached and
+    reused by the evaluators created afterwards; if this fails, do equation
+    by equation to catch the troublemakers
+    """
+    #[
+    separate_eids = set(separate_eids, )
     try:
-        eval(eq_.create_evaluator_func_string(equations), )
-    except:
+        cm_.ChunkedEvaluator.from_xtrings(
+            [ eqn.remove_equation_ref_from_xtring() for eqn in equations ],
+            workers=kwargs.get("compile_workers", ),
+            separate=(i for i, eqn in enumerate(equations) if eqn.id in separate_eids),
+        )
+    except Exception:
         _catch_troublemakers(equations, function_context, )
     #]
 
@@ -111,11 +195,9 @@ def _success_creating_lambda(equation, function_context):
     """
     #[
     try:
-        eval(eq_.create_evaluator_func_string([equation.xtring]))
+        compile(eq_.create_evaluator_func_string([equation.remove_equation_ref_from_xtring()]), "<equation>", "eval", )
         return True
-    except Exception as ex:
-        print(ex)
-        breakpoint()
+    except Exception:
         return False
     #]
 
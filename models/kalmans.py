@@ -0,0 +1,143 @@
+"""
+Kalman filtering of models
+"""
+
+
+#[
+from __future__ import annotations
+# from IPython import embed
+
+from typing import (Self, NoReturn, Protocol, runtime_checkable, )
+from collections.abc import (Iterable, )
+import numpy as np_
+
+from ..dataman import (databanks as db_, dataslabs as ds_, )
+from ..fords import (kalmans as fk_, )
+from . import (sources as ms_, )
+#]
+
+
+@runtime_checkable
+class KalmanFilterableProtocol(Protocol, ):
+    num_variants: int
+    _variants: Iterable
+    def get_ordered_names(): ...
+    def get_solution_vectors(): ...
+    def create_name_to_qid(): ...
+
+
+class KalmanMixin:
+    """
+    """
+    #[
+    def kalman_filter(
+        self: KalmanFilterableProtocol,
+        in_databank: db_.Databank,
+        base_range: Iterable[Dater],
+        /,
+        deviation: bool = False,
+        **kwargs,
+    ) -> dict[str, db_.Databank | list[float]]:
+        """
+        Run the Kalman filter on the observations of the measurement
+        variables in in_databank over base_range for each variant, with the
+        shock standard deviations given by the std_ quantities
+        ----------------------------------------------------------------
+        * kwargs -- tolerance= and diffuse_scale=, see
+        fords.kalmans.filter_flat
+
+        Return the "predicted" and "filtered" transition variables and the
+        "prediction_errors" of the measurement variables as databanks with
+        one column per variant, and the "log_likelihood" and the
+        "steady_period" for each variant
+        """
+        base_range = [ t for t in base_range ]
+        vec = self.get_solution_vectors()
+        names = self.get_ordered_names()
+        observation_names = [ names[t.qid] for t in vec.measurement_variables ]
+        state_rows = [ j for j, t in enumerate(vec.transition_variables) if t.shift == 0 ]
+        state_names = [ names[vec.transition_variables[j].qid] for j in state_rows ]
+        transition_std_qids = _get_std_qids(self, vec.transition_shocks, )
+        measurement_std_qids = _get_std_qids(self, vec.measurement_shocks, )
+        #
+        outputs = [
+            fk_.filter_flat(
+                variant.solution,
+                ds_.Dataslab.from_databank(in_databank, observation_names, base_range, column=i, ).data,
+                variant.levels[transition_std_qids],
+                variant.levels[measurement_std_qids],
+                deviation,
+                **kwargs,
+            )
+            for i, variant in enumerate(self._variants, )
+        ]
+        #
+        create_databank = lambda arrays, row_names: ds_.multiple_to_databank([
+            ds_.Dataslab.from_array(a, row_names, base_range, ) for a in arrays
+        ])
+        return {
+            "predicted": create_databank([ o.predicted[state_rows, :] for o in outputs ], state_names, ),
+            "filtered": create_databank([ o.filtered[state_rows, :] for o in outputs ], state_names, ),
+            "prediction_errors": create_databank([ o.prediction_errors for o in outputs ], observation_names, ),
+            "log_likelihood": [ float(o.log_likelihood) for o in outputs ],
+            "steady_period": [ o.steady_period for o in outputs ],
+        }
+
+    def evaluate_log_likelihood(
+        self: KalmanFilterableProtocol,
+        in_databank: db_.Databank,
+        base_range: Iterable[Dater],
+        /,
+        deviation: bool = False,
+        prediction_errors: bool = False,
+    ) -> list[float] | tuple[list[float], db_.Databank]:
+        """
+        Evaluate the log-likelihood of the observations of the measurement
+        variables in in_databank over base_range for each variant, using
+        the Chandrasekhar recursions, see fords.kalmans.evaluate_log_likelihood;
+        with prediction_errors=True, return also a databank of the
+        prediction errors with one column per variant
+        """
+        base_range = [ t for t in base_range ]
+        vec = self.get_solution_vectors()
+        names = self.get_ordered_names()
+        observation_names = [ names[t.qid] for t in vec.measurement_variables ]
+        transition_std_qids = _get_std_qids(self, vec.transition_shocks, )
+        measurement_std_qids = _get_std_qids(self, vec.measurement_shocks, )
+        #
+        outputs = [
+            fk_.evaluate_log_likelihood(
+                variant.solution,
+                ds_.Dataslab.from_databank(in_databank, observation_names, base_range, column=i, ).data,
+                variant.levels[transition_std_qids],
+                variant.levels[measurement_std_qids],
+                deviation,
+                return_prediction_errors=prediction_errors,
+            )
+            for i, variant in enumerate(self._variants, )
+        ]
+        if not prediction_errors:
+            return [ float(o) for o in outputs ]
+        return (
+            [ float(log_likelihood) for log_likelihood, _ in outputs ],
+            ds_.multiple_to_databank([
+                ds_.Dataslab.from_array(errors, observation_names, base_range, )
+                for _, errors in outputs
+            ]),
+        )
+    #]
+
+
+def _get_std_qids(
+    self: KalmanFilterableProtocol,
+    shocks: Iterable[Token],
+    /,
+) -> list[int]:
+    """
+    Get the qids of the std_ quantities of the shocks
+    """
+    #[
+    names = self.get_ordered_names()
+    name_to_qid = self.create_name_to_qid()
+    return [ name_to_qid[ms_.STD_PREFIX + names[t.qid]] for t in shocks ]
+    #]
@@ -9,10 +9,12 @@ from __future__ import annotations
 
 from typing import (Self, TypeAlias, NoReturn, Literal, Protocol, runtime_checkable)
 from collections.abc import (Iterable, )
+import itertools as it_
 import numpy as np_
 
 from ..dataman import (databanks as db_, dataslabs as ds_, )
-from ..fords import (simulators as sr_, )
+from ..fords import (simulators as sr_, stochastics as sk_, )
+from . import (sources as ms_, )
 #]
 
 
@@ -23,6 +25,7 @@ class SimulatableProtocol(Protocol, ):
     def get_extended_range_from_base_range(): ...
     def get_ordered_names(): ...
     def get_solution_vectors(): ...
+    def create_name_to_qid(): ...
 
 
 class SimulationMixin:
@@ -65,5 +68,110 @@ class SimulationMixin:
         out_databank = out_databank | self.get_parameters_stds()
 
         return out_databank
-    #]
 
+    def simulate_scenarios(
+        self: SimulatableProtocol,
+        data: np_.ndarray,
+        base_range: Iterable[Dater],
+        /,
+        anticipate: bool = True,
+        deviation: bool = False,
+    ) -> np_.ndarray:
+        """
+        Simulate a batch of scenarios in one pass for each variant
+        -----------------------------------------------------------
+        * data -- quantities × periods × scenarios tensor with the
+        quantities ordered as in get_ordered_names and the periods spanning
+        the extended range of base_range, shared by all variants; or
+        variants × quantities × periods × scenarios with one slice per
+        variant
+
+        Return a variants × quantities × periods × scenarios tensor
+        """
+        ext_range, base_columns = self.get_extended_range_from_base_range(base_range)
+        data = np_.asarray(data, dtype=float, )
+        shape = (len(self.get_ordered_names()), len(ext_range), )
+        if data.ndim not in (3, 4, ) or data.shape[-3:-1] != shape:
+            raise ValueError(f"Scenario data must be quantities × periods × scenarios with {shape[0]} quantities and {shape[1]} periods")
+        data = np_.broadcast_to(data, (self.num_variants, ) + data.shape[-3:], )
+        solution_vectors = self.get_solution_vectors()
+        return np_.stack([
+            sr_.simulate_batch(
+                variant.solution, solution_vectors,
+                np_.array(variant_data, ), base_columns, deviation, anticipate,
+            )
+            for variant, variant_data in zip(self._variants, data, )
+        ])
+
+    def simulate_stochastic(
+        self: SimulatableProtocol,
+        in_databank: db_.Databank,
+        base_range: Iterable[Dater],
+        /,
+        num_draws: int = 1000,
+        block_size: int = 1000,
+        seed: np_.random.Generator | int | None = None,
+        quantiles: Iterable[float] = (0.05, 0.25, 0.5, 0.75, 0.95, ),
+        anticipate: bool = False,
+        deviation: bool = False,
+        **kwargs,
+    ) -> dict[str | float, db_.Databank]:
+        """
+        Monte Carlo simulation with normally distributed shocks whose
+        standard deviations are the std_ quantities of each variant
+        ------------------------------------------------------------------
+        * in_databank -- initial conditions and shocks to which the draws
+        are added
+        * num_draws -- number of draws, simulated in blocks of block_size
+        * seed -- seed or numpy random generator; one generator draws the
+        shocks for all variants in turn
+        * quantiles -- probabilities of the quantiles to report
+        * kwargs -- num_bins=, width= and warmup_size=, see fords.stochastics.StreamingSummary
+
+        Return databanks of the "mean", the "std" and each quantile keyed by
+        its probability, for the variables and shocks over base_range, with
+        one column per variant
+        """
+        ext_range, base_columns = self.get_extended_range_from_base_range(base_range)
+        names = self.get_ordered_names()
+        name_to_qid = self.create_name_to_qid()
+        vec = self.get_solution_vectors()
+        #
+        shock_qids = [ t.qid for t in it_.chain(vec.transition_shocks, vec.measurement_shocks, ) ]
+        std_qids = [ name_to_qid[ms_.STD_PREFIX + names[qid]] for qid in shock_qids ]
+        summary_rows = sorted(set(it_.chain(
+            (t.qid for t in vec.transition_variables if t.shift == 0),
+            (t.qid for t in vec.measurement_variables),
+            shock_qids,
+        )))
+        #
+        generator = np_.random.default_rng(seed, )
+        summaries = [
+            sk_.simulate_stochastic(
+                variant.solution, vec,
+                ds_.Dataslab.from_databank(in_databank, names, ext_range, column=i, ).data,
+                base_columns, dict(zip(shock_qids, variant.levels[std_qids], )), summary_rows,
+                deviation, anticipate,
+                num_draws=num_draws, block_size=block_size, generator=generator, **kwargs,
+            )
+            for i, variant in enumerate(self._variants, )
+        ]
+        #
+        statistics = {
+            "mean": [ s.mean for s in summaries ],
+            "std": [ s.std for s in summaries ],
+        }
+        quantile_arrays = [ s.get_quantiles(quantiles, ) for s in summaries ]
+        for k, q in enumerate(quantiles, ):
+            statistics[q] = [ a[k] for a in quantile_arrays ]
+        #
+        row_names = [ names[qid] for qid in summary_rows ]
+        column_dates = [ ext_range[c] for c in base_columns ]
+        return {
+            key: ds_.multiple_to_databank([
+                ds_.Dataslab.from_array(a, row_names, column_dates, )
+                for a in arrays
+            ])
+            for key, arrays in statistics.items()
+        }
+    #]
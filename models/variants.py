@@ -6,12 +6,12 @@
 from __future__ import annotations
 # from IPython import embed
 
-import warnings
 import numpy as np_
 import operator as op_
 from numbers import Number
 from typing import (Self, NoReturn, TypeAlias, Literal, Callable, )
 
+from .. import (quantities as qu_, )
 from ..quantities import get_max_qid
 #]
 
@@ -60,35 +60,40 @@ class Variant:
         /,
         num_columns: int = 1,
         shift_in_first_column: int = 0,
+        out: np_.ndarray | None = None,
+        logly_masks: tuple[np_.ndarray, np_.ndarray] | None = None,
+        shift_vec: np_.ndarray | None = None,
     ) -> np_.ndarray:
         """
+        Create the steady array; written into out (quantities × num_columns)
+        if given; logly_masks and shift_vec can be passed in precomputed, see
+        fords.descriptors.SystemWorkspace
         """
-        levels = np_.copy(self.levels).reshape(-1, 1)
-        changes = np_.copy(self.changes).reshape(-1, 1)
+        levels = self.levels.reshape(-1, 1)
+        changes = self.changes.reshape(-1, 1)
         #
         if num_columns==1 and shift_in_first_column==0:
-            return levels
+            if out is None:
+                return np_.copy(levels)
+            out[...] = levels
+            return out
         #
-        logly = np_.array([
-            qid_to_logly[i] is True
-            for i in range(levels.shape[0])
-        ])
+        logly, _ = (
+            logly_masks if logly_masks is not None
+            else qu_.create_logly_masks(qid_to_logly, levels.shape[0], )
+        )
+        if shift_vec is None:
+            shift_vec = np_.arange(shift_in_first_column, shift_in_first_column+num_columns, )
         #
-        shift_vec = np_.array(range(shift_in_first_column, shift_in_first_column+num_columns))
-        #
-        warnings.filterwarnings(action="ignore", category=RuntimeWarning)
-        levels[logly] = np_.log(levels[logly])
-        changes[logly] = np_.log(changes[logly])
-        warnings.filterwarnings(action="default", category=RuntimeWarning)
-        #
-        levels[np_.isnan(levels) | np_.isinf(levels)] = np_.nan
-        changes[np_.isnan(changes) | np_.isinf(changes)] = 0
-        #
-        steady_array = levels + changes * shift_vec
-        #
-        warnings.filterwarnings(action="ignore", category=RuntimeWarning)
-        steady_array[logly, :] = np_.exp(steady_array[logly, :])
-        warnings.filterwarnings(action="default", category=RuntimeWarning)
+        with np_.errstate(divide="ignore", invalid="ignore", over="ignore", ):
+            maybelog_levels = np_.where(logly, np_.log(levels), levels, )
+            maybelog_changes = np_.where(logly, np_.log(changes), changes, )
+            np_.copyto(maybelog_levels, np_.nan, where=np_.isinf(maybelog_levels), )
+            np_.copyto(maybelog_changes, 0, where=~np_.isfinite(maybelog_changes), )
+            #
+            steady_array = np_.multiply(maybelog_changes, shift_vec, out=out, )
+            steady_array += maybelog_levels
+            np_.exp(steady_array, out=steady_array, where=logly, )
         #
         return steady_array
 
@@ -98,15 +103,25 @@ class Variant:
         /,
         num_columns: int = 1,
         shift_in_first_column: int = 0,
+        out: np_.ndarray | None = None,
+        logly_masks: tuple[np_.ndarray, np_.ndarray] | None = None,
     ) -> np_.ndarray:
         """
+        Create the zero array; written into out (quantities × num_columns)
+        if given; logly_masks can be passed in precomputed, see
+        fords.descriptors.SystemWorkspace
         """
-        levels = np_.copy(self.levels).reshape(-1, 1)
-        inx_set_to_0 = [ qid for qid, logly in qid_to_logly.items() if logly is False ]
-        inx_set_to_1 = [ qid for qid, logly in qid_to_logly.items() if logly is True ]
-        levels[inx_set_to_0] = 0
-        levels[inx_set_to_1] = 1
-        return np_.tile(levels, (1, num_columns))
+        levels = self.levels.reshape(-1, 1)
+        logly, not_logly = (
+            logly_masks if logly_masks is not None
+            else qu_.create_logly_masks(qid_to_logly, levels.shape[0], )
+        )
+        if out is None:
+            out = np_.empty((levels.shape[0], num_columns, ), dtype=float, )
+        out[...] = levels
+        np_.copyto(out, 1, where=logly, )
+        np_.copyto(out, 0, where=not_logly, )
+        return out
     #]
 
 
@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import enum
 import dataclasses
+import numpy as np_
 
 from typing import TypeAlias
 from collections.abc import Iterable
@@ -126,6 +127,20 @@ def create_qid_to_logly(quantities: Quantities) -> dict[int, bool]:
     return { qty.id: qty.logly for qty in quantities }
 
 
+def create_logly_masks(
+    qid_to_logly: dict[int, bool | None],
+    num_quantities: int,
+    /,
+) -> tuple[np_.ndarray, np_.ndarray]:
+    """
+    Create the columns of flags marking the quantities with log-status True
+    and False; quantities without log-status are marked in neither
+    """
+    logly = np_.array([ qid_to_logly.get(qid) is True for qid in range(num_quantities) ]).reshape(-1, 1)
+    not_logly = np_.array([ qid_to_logly.get(qid) is False for qid in range(num_quantities) ]).reshape(-1, 1)
+    return logly, not_logly
+
+
 def change_logly(
     quantities: Quantities,
     new_logly: bool,